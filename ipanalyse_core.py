@@ -0,0 +1,2232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Cœur d'analyse d'IPanalyse, sans Qt : lecture du CSV, enrichissement, scoring,
+# rapport HTML. reportlab / matplotlib ne sont chargés qu'au premier export PDF.
+# Utilisable en ligne de commande (python ipanalyse_core.py --help) ou via run_analysis().
+
+import argparse, os, re, csv, json, ipaddress, urllib.request, urllib.parse, urllib.error, webbrowser, threading, sqlite3, time
+import http.client, queue, ssl, math, io, gzip, bz2, lzma, mmap, struct, sys, socket, itertools, functools, signal
+from array import array
+from datetime import datetime, timedelta
+from collections import Counter, defaultdict
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import numpy as np   # classification locale vectorisée (installé avec matplotlib)
+except ImportError:
+    np = None
+
+# =========================
+# CONSTANTES / CONFIG
+# =========================
+CONFIG_FILE = "config.json"
+CACHE_FILE = "ip_cache.sqlite"
+VERBOSE_LOG_FILE = "journal_analyse.log"
+HTML_WRITE_BUFFER = 1 << 20   # octets tamponnés avant chaque écriture du rapport HTML
+REPORT_PROGRESS_CHARS = 8 << 20   # avancement HTML signalé tous les ~8 Mo écrits
+REPORT_PROGRESS_PAGES = 10        # avancement PDF signalé toutes les 10 pages
+
+COUNTRY_CODES = {
+    "FR":"France","SE":"Suède","US":"États-Unis","DE":"Allemagne","IT":"Italie","ES":"Espagne",
+    "GB":"Royaume-Uni","CA":"Canada","CN":"Chine","JP":"Japon","AU":"Australie","BR":"Brésil",
+    "RU":"Russie","IN":"Inde","NL":"Pays-Bas","BE":"Belgique","CH":"Suisse","NO":"Norvège",
+    "DK":"Danemark","FI":"Finlande"
+}
+
+COUNTRY_COORDS = {
+    "France":[46.2276,2.2137],"Suède":[60.1282,18.6435],"États-Unis":[37.0902,-95.7129],
+    "Allemagne":[51.1657,10.4515],"Italie":[41.8719,12.5674],"Espagne":[40.4637,-3.7492],
+    "Royaume-Uni":[55.3781,-3.4360],"Canada":[56.1304,-106.3468],"Chine":[35.8617,104.1954],
+    "Japon":[36.2048,138.2529],"Australie":[-25.2744,133.7751],"Brésil":[-14.2350,-51.9250],
+    "Russie":[61.5240,105.3188],"Inde":[20.5937,78.9629],"Pays-Bas":[52.1326,5.2913],
+    "Belgique":[50.5039,4.4699],"Suisse":[46.8182,8.2275],"Norvège":[60.4720,8.4689],
+    "Danemark":[56.2639,9.5018],"Finlande":[61.9241,25.7482]
+}
+
+SERVICES = {
+    # On demande aussi l'ISP à ip-api
+    # "batch" : endpoint POST acceptant une liste JSON d'IP (au plus "size" par requête)
+    # "rate_limit" : requêtes/minute de l'offre publique (cadencées via X-Rl / X-Ttl)
+    "ip-api":{"url":"http://ip-api.com/json/{ip}?fields=status,countryCode,hosting,isp,org,as,asname,query","requires_key":False,
+              "rate_limit":45,
+              "batch":{"url":"http://ip-api.com/batch?fields=status,countryCode,hosting,isp,org,as,asname,query","size":100,
+                       "rate_limit":15}},
+    "ipdata":{"url":"https://api.ipdata.co/{ip}?api-key={key}","requires_key":True,
+              "batch":{"url":"https://api.ipdata.co/bulk?api-key={key}","size":100}},
+    "ipqualityscore":{"url":"https://ipqualityscore.com/api/json/ip/{key}/{ip}","requires_key":True}
+}
+
+DEFAULT_LOOKUP_WORKERS = 8   # requêtes de lookup simultanées
+
+# Nouveaux essais des lookups "timed out" (attente doublée à chaque tour)
+LOOKUP_RETRIES = 2
+LOOKUP_BACKOFF = 1.0   # secondes
+
+# Connexions HTTP persistantes (une réserve par fournisseur)
+DEFAULT_HTTP_POOL_SIZE = DEFAULT_LOOKUP_WORKERS
+DEFAULT_HTTP_TIMEOUT = 5   # secondes
+
+# Cache disque des lookups réseau
+DEFAULT_CACHE_TTL_DAYS = 30
+DEFAULT_CACHE_NEGATIVE_TTL_MIN = 10   # résultats "timed out"
+DEFAULT_CACHE_MAX_ENTRIES = 500000
+
+# Agrégation des IPv6 par préfixe (/64 : un abonné mobile, /48 : un site)
+IPV6_PREFIX_LEN = 64
+
+DEFAULT_WEIGHTS = {
+    "off_country": 40,
+    "vpn_ip2p": 30,
+    "hosting": 25,
+    "vpn_other": 20,
+    "unique": 25,
+    "few": 10,
+    "unusual": 15,
+    # Nouveaux critères ISP
+    "isp_fr": 5,       # ISP du pays principal (catalogue ISP_CATALOGUE)
+    "isp_foreign": 15    # ISP hors pays principal / inconnu 
+}
+
+def load_config():
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except:
+            pass
+    return {
+        "recent_files": [],
+        "main_country": "France",
+        "output_dir": ".",
+        "export_html": True,
+        "export_pdf": False,
+        "exclude_other_countries": False,
+        "verbose_log": False,
+        "suspect_datetime_windows": "",
+        "weights": DEFAULT_WEIGHTS.copy(),
+        "api_key": "",
+        "ip2proxy": "",
+        "unusual_ranges": "",
+        "lookup_workers": DEFAULT_LOOKUP_WORKERS,
+        "http_timeout": DEFAULT_HTTP_TIMEOUT,
+        "lookup_retries": LOOKUP_RETRIES,
+        "disk_cache": True,
+        "cache_path": CACHE_FILE,
+        "cache_ttl_days": DEFAULT_CACHE_TTL_DAYS,
+        "cache_negative_ttl_min": DEFAULT_CACHE_NEGATIVE_TTL_MIN,
+        "cache_max_entries": DEFAULT_CACHE_MAX_ENTRIES,
+        "ipv6_prefix_len": IPV6_PREFIX_LEN,
+        "isp_catalogue": {},
+    }
+
+def save_config(cfg_updates):
+    cfg = load_config()
+    cfg.update(cfg_updates)
+    try:
+        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
+            json.dump(cfg, f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        print("Erreur sauvegarde config:", e)
+
+CONFIG = load_config()
+
+# =========================
+# IP2Proxy Lite (local)
+# =========================
+IP2P_INDEX = None
+IP2P_SIDECAR_EXT = ".idx"
+IP2P_SIDECAR_MAGIC = b"IP2PIX2" + (b"L" if sys.byteorder == "little" else b"B")
+_IP2P_HEADER = struct.Struct("<8sQqQQQ")   # magic, taille source, mtime source (ns), nb plages v4, nb plages v6, taille tables
+_U64_MASK = (1 << 64) - 1
+IPV4_MAPPED = 0xFFFF << 32   # ::ffff:0:0/96 (IPv4 dans une base IPv6)
+
+def parse_ip(ip_str):
+    # (version, entier) via inet_pton, sans objet ipaddress ; None si invalide
+    try:
+        if ":" in ip_str:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip_str), "big")
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip_str), "big")
+    except (OSError, ValueError):
+        pass
+    try:
+        addr = ipaddress.ip_address(ip_str)   # ex. zone IPv6 "fe80::1%eth0"
+    except ValueError:
+        return None
+    return addr.version, int(addr)
+
+class Ip2ProxyIndex:
+    # Plages IP2Proxy en tableaux typés : débuts / fins IPv4 (uint32) triés, et indices
+    # vers les tables (internées) des types de proxy et des pays. Les plages IPv6
+    # sont rangées à part, bornes 128 bits découpées en moitiés hautes / basses (uint64).
+    def __init__(self, starts, ends, types, countries, type_names, country_names, path=None, v6=None):
+        self.starts, self.ends = starts, ends
+        self.types, self.countries = types, countries
+        self.type_names, self.country_names = type_names, country_names
+        (self.starts6_hi, self.starts6_lo, self.ends6_hi, self.ends6_lo,
+         self.types6, self.countries6) = v6 or (array("Q"), array("Q"), array("Q"), array("Q"), array("H"), array("H"))
+        self.path = path
+        self._mmap = None
+
+    def __len__(self):
+        return len(self.starts) + len(self.starts6_hi)
+
+    def lookup(self, ip_int, version=4):
+        if version == 6:
+            if ip_int >> 32 != 0xFFFF:
+                return self._lookup6(ip_int)
+            ip_int &= 0xFFFFFFFF
+        pos = bisect_right(self.starts, ip_int) - 1
+        if pos >= 0 and ip_int <= self.ends[pos]:
+            return self.type_names[self.types[pos]], self.country_names[self.countries[pos]]
+        return None, None
+
+    def _lookup6(self, ip_int):
+        # Dichotomie sur la moitié haute, puis sur la moitié basse parmi les égales
+        hi, lo = ip_int >> 64, ip_int & _U64_MASK
+        first = bisect_left(self.starts6_hi, hi)
+        last = bisect_right(self.starts6_hi, hi, first)
+        pos = bisect_right(self.starts6_lo, lo, first, last) - 1
+        if pos >= 0 and (hi, lo) <= (self.ends6_hi[pos], self.ends6_lo[pos]):
+            return self.type_names[self.types6[pos]], self.country_names[self.countries6[pos]]
+        return None, None
+
+    def lookup_many(self, ints):
+        # ints : tableau NumPy uint32 (IPv4) -> {position dans ints: (type, pays)} des IP couvertes
+        starts = np.frombuffer(self.starts, dtype=np.uint32)
+        ends = np.frombuffer(self.ends, dtype=np.uint32)
+        pos = np.searchsorted(starts, ints, side="right") - 1
+        hit = pos >= 0
+        hit[hit] = ints[hit] <= ends[pos[hit]]
+        return {i: (self.type_names[self.types[p]], self.country_names[self.countries[p]])
+                for i, p in zip(np.flatnonzero(hit).tolist(), pos[hit].tolist())}
+
+    @classmethod
+    def from_csv(cls, path):
+        starts, ends, types, countries = array("I"), array("I"), array("H"), array("H")
+        ranges6 = []
+        type_ids, country_ids = {}, {None: 0}
+        with open(path, 'r', encoding='utf-8', newline='') as fh:
+            for row in csv.reader(fh):
+                if len(row)<3:
+                    continue
+                try:
+                    s=int(row[0]); e=int(row[1])
+                except:
+                    continue
+                ptype=row[2].strip().upper() if row[2].strip() else "PX1"
+                cname=row[3] if len(row)>3 else None
+                tid = type_ids.setdefault(ptype, len(type_ids))
+                cid = country_ids.setdefault(cname, len(country_ids))
+                if e > 0xFFFFFFFF and IPV4_MAPPED <= s and e <= IPV4_MAPPED | 0xFFFFFFFF:
+                    s -= IPV4_MAPPED; e -= IPV4_MAPPED   # base IPv6 : plages IPv4 en ::ffff:a.b.c.d
+                if e > 0xFFFFFFFF:
+                    ranges6.append((s, e, tid, cid))
+                    continue
+                starts.append(s); ends.append(e)
+                types.append(tid); countries.append(cid)
+        if any(starts[i] > starts[i+1] for i in range(len(starts)-1)):
+            order = sorted(range(len(starts)), key=starts.__getitem__)
+            starts, ends = array("I", (starts[i] for i in order)), array("I", (ends[i] for i in order))
+            types, countries = array("H", (types[i] for i in order)), array("H", (countries[i] for i in order))
+        ranges6.sort()
+        v6 = (array("Q", (r[0] >> 64 for r in ranges6)), array("Q", (r[0] & _U64_MASK for r in ranges6)),
+              array("Q", (r[1] >> 64 for r in ranges6)), array("Q", (r[1] & _U64_MASK for r in ranges6)),
+              array("H", (r[2] for r in ranges6)), array("H", (r[3] for r in ranges6)))
+        return cls(starts, ends, types, countries, list(type_ids), list(country_ids), path, v6)
+
+    def _arrays(self):
+        # Ordre dans le fichier annexe : uint64, uint32 puis uint16 (alignement naturel)
+        return (self.starts6_hi, self.starts6_lo, self.ends6_hi, self.ends6_lo,
+                self.starts, self.ends, self.types, self.countries, self.types6, self.countries6)
+
+    def save(self, sidecar, source):
+        st = os.stat(source)
+        tables = json.dumps([self.type_names, self.country_names]).encode("utf-8")
+        tables += b"\0" * (-len(tables) % 8)
+        # écriture dans un fichier temporaire : une projection existante de l'ancien fichier reste valide
+        with open(sidecar + ".tmp", "wb") as f:
+            f.write(_IP2P_HEADER.pack(IP2P_SIDECAR_MAGIC, st.st_size, st.st_mtime_ns,
+                                      len(self.starts), len(self.starts6_hi), len(tables)))
+            f.write(tables)
+            for arr in self._arrays():
+                arr.tofile(f)
+        os.replace(sidecar + ".tmp", sidecar)
+
+    @classmethod
+    def load(cls, sidecar, source):
+        # Projette le fichier annexe en mémoire ; None s'il est absent ou périmé
+        st = os.stat(source)
+        with open(sidecar, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size, mtime, n4, n6, tlen = _IP2P_HEADER.unpack_from(mm, 0)
+        if magic != IP2P_SIDECAR_MAGIC or size != st.st_size or mtime != st.st_mtime_ns:
+            mm.close()
+            return None
+        off = _IP2P_HEADER.size
+        type_names, country_names = json.loads(bytes(mm[off:off+tlen]).rstrip(b"\0"))
+        off += tlen
+        mv = memoryview(mm)
+        views = []
+        for code, width, n in (("Q", 8, n6),) * 4 + (("I", 4, n4),) * 2 + (("H", 2, n4),) * 2 + (("H", 2, n6),) * 2:
+            views.append(mv[off:off + n*width].cast(code))
+            off += n*width
+        s6h, s6l, e6h, e6l, starts, ends, types, countries, types6, countries6 = views
+        idx = cls(starts, ends, types, countries, type_names, country_names, source,
+                  (s6h, s6l, e6h, e6l, types6, countries6))
+        idx._mmap = mm
+        return idx
+
+class Ip2ProxyBin:
+    # Base IP2Proxy .BIN lue directement : fichier projeté en mémoire, recherche
+    # dichotomique bornée par la table d'index des 16 bits de poids fort.
+    # Colonnes (1 = ip_from) par type de base PX1…PX12 :
+    COUNTRY_POS   = (0, 2, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3, 3)
+    PROXYTYPE_POS = (0, 0, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2)
+    _HEADER = struct.Struct("<5B6IB")
+    _U32 = struct.Struct("<I")
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (self.dbtype, self.dbcolumn, _, _, _, self.v4_count, self.v4_addr,
+         self.v6_count, self.v6_addr, self.v4_index, self.v6_index, product) = self._HEADER.unpack_from(self._mm, 0)
+        if product not in (0, 2) or not 0 < self.dbtype < len(self.COUNTRY_POS):
+            self._mm.close()
+            raise ValueError(f"{path} : base IP2Proxy BIN non reconnue")
+        self.path = path
+
+    def __len__(self):
+        return self.v4_count + self.v6_count
+
+    def _u32(self, pos):
+        # positions 1-based, comme dans le format IP2Location
+        return self._U32.unpack_from(self._mm, pos - 1)[0]
+
+    def _u128(self, pos):
+        return int.from_bytes(self._mm[pos-1:pos+15], "little")
+
+    def _str(self, ptr):
+        n = self._mm[ptr]
+        return self._mm[ptr+1:ptr+1+n].decode("utf-8", "replace")
+
+    def lookup(self, ip_int, version=4):
+        if version == 6 and ip_int >> 32 != 0xFFFF:
+            if not self.v6_count:
+                return None, None
+            # IPv6 : ip_from sur 16 octets, les autres colonnes décalées de 12
+            return self._search(min(ip_int, (1 << 128) - 2), self.v6_count, self.v6_addr,
+                                self.v6_index, 112, self._u128, 12)
+        return self._search(min(ip_int & 0xFFFFFFFF, 0xFFFFFFFE), self.v4_count, self.v4_addr,
+                            self.v4_index, 16, self._u32, 0)
+
+    def _search(self, ip_int, count, base, index, shift, read_ip, extra):
+        width = self.dbcolumn * 4 + extra
+        low, high = 0, count
+        if index > 0:
+            pos = ((ip_int >> shift) << 3) + index
+            low, high = self._u32(pos), self._u32(pos + 4)
+        while low <= high:
+            mid = (low + high) // 2
+            row = base + mid * width
+            ip_from, ip_to = read_ip(row), read_ip(row + width)
+            if ip_from <= ip_int < ip_to:
+                return self._record(row + extra)
+            if ip_int < ip_from: high = mid - 1
+            else: low = mid + 1
+        return None, None
+
+    def lookup_many(self, ints):
+        # Pas de tableaux contigus à vectoriser : une recherche indexée par IP
+        found = {}
+        for i, ip_int in enumerate(ints.tolist()):
+            ptype, cname = self.lookup(ip_int)
+            if ptype: found[i] = (ptype, cname)
+        return found
+
+    def _record(self, row):
+        cpos, ppos = self.COUNTRY_POS[self.dbtype], self.PROXYTYPE_POS[self.dbtype]
+        cname = self._str(self._u32(row + 4 * (cpos - 1))) if cpos else None
+        if ppos:
+            ptype = self._str(self._u32(row + 4 * (ppos - 1)))
+        else:
+            ptype = "PX1" if cname and cname != "-" else "-"   # PX1 : présence = proxy
+        if ptype == "-":
+            return None, None
+        return ptype, (cname if cname != "-" else None)
+
+def load_ip2proxy(path):
+    # Backend choisi par extension : .BIN lu en place, sinon CSV (index .idx)
+    global IP2P_INDEX
+    if path.lower().endswith(".bin"):
+        try:
+            IP2P_INDEX = Ip2ProxyBin(path)
+            return len(IP2P_INDEX)
+        except (OSError, ValueError, struct.error):
+            IP2P_INDEX = None
+            return 0
+    return load_ip2proxy_lite_csv(path)
+
+def load_ip2proxy_lite_csv(path):
+    # Réutilise l'index binaire <csv>.idx s'il correspond au CSV, sinon le (re)construit
+    global IP2P_INDEX
+    sidecar = path + IP2P_SIDECAR_EXT
+    try:
+        index = None
+        if os.path.exists(sidecar):
+            try:
+                index = Ip2ProxyIndex.load(sidecar, path)
+            except (OSError, ValueError, struct.error):
+                index = None
+        if index is None:
+            index = Ip2ProxyIndex.from_csv(path)
+            try:
+                index.save(sidecar, path)
+            except OSError:
+                pass
+        IP2P_INDEX = index
+        return len(index)
+    except:
+        IP2P_INDEX = None
+        return 0
+
+def ip2proxy_lookup(ip):
+    if not IP2P_INDEX: return None,None
+    addr = parse_ip(ip)
+    if addr is None: return None,None
+    return IP2P_INDEX.lookup(addr[1], addr[0])
+
+# =========================
+# UTILITAIRES
+# =========================
+def is_private_ip(ip):
+    try:
+        return ipaddress.ip_address(ip).is_private
+    except:
+        return True
+
+DATETIME_FORMATS = [
+    "%Y-%m-%d %H:%M:%S","%Y-%m-%d %H:%M",
+    "%d/%m/%Y %H:%M:%S","%d/%m/%Y %H:%M",
+    "%Y-%m-%dT%H:%M:%S","%Y-%m-%dT%H:%M"
+]
+
+def parse_datetime_loose(date_str):
+    if not date_str: return None
+    for f in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(date_str.strip(), f)
+        except:
+            continue
+    try:
+        return datetime.fromisoformat(date_str.strip().replace(" ","T"))
+    except:
+        return None
+
+def fixed_width_parser(fmt):
+    # Analyseur par découpage à positions fixes pour un format de DATETIME_FORMATS
+    # (champs complétés par des zéros) ; renvoie None si la chaîne ne suit pas le gabarit.
+    layout = fmt
+    for code, field in (("%Y","YYYY"),("%m","mm"),("%d","dd"),("%H","HH"),("%M","MM"),("%S","SS")):
+        layout = layout.replace(code, field)
+    y, mo, d, h, mi = (layout.index(k) for k in ("YYYY","mm","dd","HH","MM"))
+    sec = layout.find("SS")
+    seps = [(i, c) for i, c in enumerate(layout) if c not in "YmdHMS"]
+    size = len(layout)
+
+    def parse(s):
+        if len(s) != size: return None
+        for i, c in seps:
+            if s[i] != c: return None
+        try:
+            return datetime(int(s[y:y+4]), int(s[mo:mo+2]), int(s[d:d+2]),
+                            int(s[h:h+2]), int(s[mi:mi+2]), int(s[sec:sec+2]) if sec >= 0 else 0)
+        except ValueError:
+            return None
+    return parse
+
+class DateParser:
+    # Format d'horodatage déduit une fois par fichier (sur un échantillon) ; chaque
+    # ligne passe par l'analyseur rapide, parse_datetime_loose en dernier recours.
+    def __init__(self, samples=()):
+        self.fmt = None
+        self._fast = None
+        samples = [x.strip() for x in samples if x and x.strip()]
+        best = 0
+        for fmt in DATETIME_FORMATS:
+            fast = fixed_width_parser(fmt)
+            hits = sum(1 for x in samples if fast(x) is not None)
+            if hits > best:
+                best, self.fmt, self._fast = hits, fmt, fast
+
+    def __call__(self, date_str):
+        if self._fast is not None:
+            dt = self._fast(date_str)
+            if dt is not None: return dt
+        return parse_datetime_loose(date_str)
+
+def detect_service(api_key):
+    if not api_key: return "ip-api"
+    elif api_key.startswith("ipd_"): return "ipdata"
+    elif len(api_key)==32: return "ipqualityscore"
+    else: return "ip-api"
+
+def parse_time_to_minutes(s):
+    try:
+        h,m = map(int, s.split(":"))
+        if 0<=h<=23 and 0<=m<=59:
+            return h*60+m
+    except:
+        pass
+    return None
+
+def parse_unusual_ranges(entry_text):
+    ranges=[]
+    parts=[p.strip() for p in entry_text.split(",") if p.strip()]
+    for part in parts:
+        if "-" not in part: continue
+        start,end=part.split("-",1)
+        s=parse_time_to_minutes(start); e=parse_time_to_minutes(end)
+        if s is None or e is None: continue
+        wrap = e < s
+        ranges.append((s,e,wrap))
+    return ranges
+
+def unusual_minute_mask(ranges):
+    # Plages inhabituelles compilées une fois en table des 1440 minutes de la journée
+    # (mask[h*60+m] == 1 si la minute est inhabituelle)
+    mask = bytearray(1440)
+    for s,e,wrap in ranges:
+        if wrap:
+            mask[s:] = b"\1" * (1440 - s)
+            mask[:e+1] = b"\1" * (e + 1)
+        else:
+            mask[s:e+1] = b"\1" * (e - s + 1)
+    return mask
+
+# Créneaux de 30 min des habitudes, indexés par h*2 + (m >= 30)
+HABIT_SLOTS = [f"{h:02d}h{m:02d}-{h:02d}h{m+29:02d}" for h in range(24) for m in (0, 30)]
+
+WINDOW_REGEX = re.compile(
+    r'\s*(?P<date>(\d{1,2}/\d{1,2}/\d{4})|(\d{4}-\d{2}-\d{2}))\s+'
+    r'(?P<start>\d{1,2}:\d{2})\s*-\s*(?P<end>\d{1,2}:\d{2})\s*'
+)
+def parse_suspect_windows(text):
+    windows=[]
+    if not text: return windows
+    parts = re.split(r'[;,|\n]+', text)
+    for part in parts:
+        part = part.strip()
+        if not part: continue
+        m = WINDOW_REGEX.fullmatch(part) or WINDOW_REGEX.search(part)
+        if not m: continue
+        date_str = m.group('date'); start_str = m.group('start'); end_str = m.group('end')
+        if '/' in date_str:
+            try: base_date = datetime.strptime(date_str, "%d/%m/%Y")
+            except: continue
+        else:
+            try: base_date = datetime.strptime(date_str, "%Y-%m-%d")
+            except: continue
+        smin = parse_time_to_minutes(start_str); emin = parse_time_to_minutes(end_str)
+        if smin is None or emin is None: continue
+        start_dt = base_date.replace(hour=smin//60, minute=smin%60)
+        end_dt   = base_date.replace(hour=emin//60, minute=emin%60)
+        if end_dt < start_dt: end_dt += timedelta(days=1)
+        windows.append((start_dt, end_dt))
+    return windows
+
+class WindowIndex:
+    # Fenêtres suspectes découpées à l'analyse en segments élémentaires triés :
+    # une recherche dichotomique donne les fenêtres (indices dans windows) d'un horodatage.
+    STEP = timedelta(microseconds=1)   # bornes incluses : segment [début, fin + 1 µs)
+
+    def __init__(self, windows):
+        self.windows = list(windows)
+        opens, closes = defaultdict(list), defaultdict(list)
+        for i, (s, e) in enumerate(self.windows):
+            opens[s].append(i); closes[e + self.STEP].append(i)
+        self.bounds = sorted(opens.keys() | closes.keys())
+        self.segments = []
+        active = set()
+        for b in self.bounds:
+            active.difference_update(closes.get(b, ()))
+            active.update(opens.get(b, ()))
+            self.segments.append(tuple(sorted(active)))
+
+    def __len__(self):
+        return len(self.windows)
+
+    def lookup(self, dt):
+        # -> tuple des fenêtres contenant dt (vide si aucune)
+        if not dt or not self.bounds: return ()
+        pos = bisect_right(self.bounds, dt) - 1
+        return self.segments[pos] if pos >= 0 else ()
+
+    def label(self, i):
+        s, e = self.windows[i]
+        end = e.strftime("%H:%M") if e.date() == s.date() else e.strftime("%d/%m/%Y %H:%M")
+        return f"{s.strftime('%d/%m/%Y %H:%M')}-{end}"
+
+# Motif d'exclusion : tout ce qui n'est pas un séparateur (blanc , ; | /), suivi le cas
+# échéant d'une longueur de préfixe CIDR complète ("/8" dans 10.0.0.0/8/90.*, pas "/90" de 92.*/90.*).
+EXCLUSION_TOKEN = re.compile(r'[^\s,;|/]+(?:/\d{1,3}(?![^\s,;|/]))?')
+# Joker IPv4 (* déjà remplacé par x) ; un nombre seul ("8") n'est pas un motif
+WILDCARD_PATTERN = re.compile(r'(?!\d+$)(?=.*[0-9x])[0-9x]{0,3}(?:\.[0-9x]{0,3}){0,3}')
+
+def split_exclusions(text):
+    return EXCLUSION_TOKEN.findall(text or "")
+
+def pattern_to_regex(pattern):
+    p=pattern.strip().replace('*','x')
+    parts=p.split('.'); regex_parts=[]
+    for part in parts:
+        if part=='' or part.lower()=='x':
+            regex_parts.append(r'\d{1,3}')
+        else:
+            esc=re.escape(part).replace('x',r'\d{1,3}')
+            regex_parts.append(esc)
+    if len(parts)<4:
+        prefix=r'\.'.join(regex_parts)
+        return re.compile(r'^'+prefix+r'(\.|$)')
+    return re.compile(r'^'+r'\.'.join(regex_parts)+r'$')
+
+class ExclusionSet:
+    # Motifs d'exclusion compilés en intervalles d'entiers fusionnés et triés (un jeu
+    # par version d'IP) : une seule recherche dichotomique par IP.
+    # Jokers IPv4 (92.*, 10.0.0.x, 1x.*) : chaque octet est développé en valeurs 0…255
+    # retenues par la regex de pattern_to_regex ; CIDR et adresses IPv6 : bornes du réseau.
+    # Motifs illisibles écartés dans invalid (patterns ne garde que ceux appliqués).
+    MAX_INTERVALS = 65536   # au-delà (ex. x.x.x.1), le motif reste testé par regex
+
+    def __init__(self, patterns):
+        self.patterns, self.invalid = [], []
+        spans = {4: [], 6: []}
+        self.regexes = []
+        for pat in patterns:
+            if '/' in pat or ':' in pat:
+                try:
+                    net = ipaddress.ip_network(pat.strip(), strict=False)
+                except ValueError:
+                    self.invalid.append(pat)
+                    continue
+                spans[net.version].append((int(net.network_address), int(net.broadcast_address)))
+            else:
+                pat = pat.strip().lower()
+                found = self._wildcard_spans(pat) if WILDCARD_PATTERN.fullmatch(pat.replace('*','x')) else []
+                if found == []:   # motif illisible ou sans octet possible (ex. 300.*)
+                    self.invalid.append(pat)
+                    continue
+                if found is None: self.regexes.append(pattern_to_regex(pat))
+                else: spans[4].extend(found)
+            self.patterns.append(pat)
+        self.starts, self.ends = {}, {}
+        for version, items in spans.items():
+            merged = []
+            for lo, hi in sorted(items):
+                if merged and lo <= merged[-1][1] + 1:
+                    if hi > merged[-1][1]: merged[-1][1] = hi
+                else:
+                    merged.append([lo, hi])
+            self.starts[version] = [m[0] for m in merged]
+            self.ends[version] = [m[1] for m in merged]
+
+    def __len__(self):
+        return len(self.patterns)
+
+    @classmethod
+    def _wildcard_spans(cls, pattern):
+        parts = pattern.strip().replace('*','x').split('.')
+        if len(parts) > 4:
+            return []
+        octets = []
+        for part in parts:
+            if part == '' or part.lower() == 'x':
+                octets.append(range(256))
+            else:
+                rx = re.compile(re.escape(part).replace('x', r'\d{1,3}'))
+                octets.append([v for v in range(256) if rx.fullmatch(str(v))])
+        octets += [range(256)] * (4 - len(parts))   # motif court = préfixe
+        # au-delà du dernier octet restreint, tout est couvert : plages contiguës
+        k = max((i for i, o in enumerate(octets) if len(o) < 256), default=-1)
+        if k < 0:
+            return [(0, 0xFFFFFFFF)]
+        runs = []
+        for v in octets[k]:
+            if runs and v == runs[-1][1] + 1: runs[-1][1] = v
+            else: runs.append([v, v])
+        if math.prod(len(o) for o in octets[:k]) * len(runs) > cls.MAX_INTERVALS:
+            return None
+        shift = 8 * (3 - k)
+        spans = []
+        for head in itertools.product(*octets[:k]):
+            base = 0
+            for v in head: base = (base << 8) | v
+            for lo, hi in runs:
+                spans.append((((base << 8) | lo) << shift, (((base << 8) | hi) << shift) | ((1 << shift) - 1)))
+        return spans
+
+    def contains(self, ip, addr=None):
+        # addr : (version, entier) déjà analysé, évite une seconde analyse de l'IP
+        if addr is None: addr = parse_ip(ip)
+        if addr is None: return False
+        version, n = addr
+        starts = self.starts[version]
+        pos = bisect_right(starts, n) - 1
+        if pos >= 0 and n <= self.ends[version][pos]:
+            return True
+        return any(rx.match(ip) for rx in self.regexes)
+
+def compute_prefix_frequencies(rows):
+    cnt = Counter()
+    for r in rows:
+        if len(r) < 2: continue
+        ip = r[1]; pays = r[2] if len(r) > 2 else None
+        if pays in ["N/A", "Privée", "timed out"]: continue
+        if ':' in ip: continue
+        parts = ip.split('.')
+        if len(parts) >= 3 and all(p.isdigit() for p in parts[:3]):
+            prefix = '.'.join(parts[:3]) + '.*'
+            cnt[prefix] += 1
+    return cnt.most_common(10)
+
+def compute_ipv6_prefix_frequencies(rows, prefix_len=IPV6_PREFIX_LEN):
+    # Équivalent IPv6 des /24 : agrégation par /64 (ou /48) ; chaque IP distincte n'est analysée qu'une fois
+    per_ip = Counter(r[1] for r in rows
+                     if len(r) > 2 and ':' in r[1] and r[2] not in ["N/A", "Privée", "timed out"])
+    shift = 128 - prefix_len
+    cnt = Counter()
+    for ip, n in per_ip.items():
+        addr = parse_ip(ip)
+        if addr and addr[0] == 6:
+            cnt[addr[1] >> shift] += n
+    return [(str(ipaddress.IPv6Network((net << shift, prefix_len))), c) for net, c in cnt.most_common(10)]
+
+# --- Détection des FAI (France par défaut)
+FRENCH_ISP_PATTERNS = [
+    r"\borange\b",
+    r"\borange business\b",
+    r"\bsfr\b",
+    r"\bsoci[eé]t[eé].*fran[çc]aise.*radiot[eé]l[eé]phone",
+    r"\bbouygues\b", r"\bbouygues.*telecom\b",
+    r"\bfree\b", r"\bfree\s*sas\b", r"\bfree mobile\b", r"\bproxad\b", r"\biliad\b",
+    r"\bla\s*poste\s*mobile\b", r"\bred(?:\s*by)?\s*sfr\b", r"\bsosh\b",
+    r"\bnrj\s*mobile\b", r"\bprixtel\b", r"\bsym?a\b", r"\bley?bara\b", r"\blyca(?:mobile)?\b",
+    r"\bcoriolis\b", r"\bauchan\s*telecom\b", r"\bcdiscount\s*mobile\b", r"\bnumericable\b",
+    # r"\bovh\b", # optionnel
+]
+
+# --- Catalogue des FAI par pays (clé : nom affiché dans « Pays principal »),
+# complété ou remplacé pays par pays via "isp_catalogue" dans config.json
+ISP_CATALOGUE = {
+    "France": FRENCH_ISP_PATTERNS,
+}
+ISP_MATCH_CACHE_SIZE = 4096   # noms d'opérateurs distincts mémorisés par matcher
+
+class IspMatcher:
+    # Motifs d'un pays compilés en une seule alternative ; verdict mémorisé
+    # (cache borné) par nom d'opérateur normalisé
+    def __init__(self, patterns, cache_size=ISP_MATCH_CACHE_SIZE):
+        self.regex = re.compile("|".join(f"(?:{p})" for p in patterns)) if patterns else None
+        self._match = functools.lru_cache(maxsize=cache_size)(self._search)
+
+    def _search(self, key):
+        return bool(self.regex and self.regex.search(key))
+
+    def __call__(self, name):
+        if not name or name == "N/A":
+            return False
+        return self._match(name.strip().lower())
+
+def isp_matcher(country, catalogue=None):
+    # catalogue : surcharges {pays: [motifs]} (config.json)
+    patterns = (catalogue or {}).get(country, ISP_CATALOGUE.get(country, []))
+    return IspMatcher(patterns)
+
+def country_label(country):
+    # Code ISO du pays s'il est connu (France -> FR), sinon son nom
+    return next((code for code, name in COUNTRY_CODES.items() if name == country), country)
+
+_FRENCH_ISP = IspMatcher(FRENCH_ISP_PATTERNS)
+
+def is_french_isp(name: str) -> bool:
+    return _FRENCH_ISP(name)
+
+# =========================
+# HTTP (keep-alive)
+# =========================
+try:
+    import certifi
+    SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+except Exception:
+    SSL_CONTEXT = ssl.create_default_context()
+
+class HttpPool:
+    # Connexions persistantes vers un hôte, partagées entre threads (au plus size ouvertes)
+    def __init__(self, scheme, host, port=None, size=DEFAULT_HTTP_POOL_SIZE, timeout=DEFAULT_HTTP_TIMEOUT):
+        self.scheme, self.host, self.port = scheme, host, port
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, int(size)))
+
+    def _connect(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=SSL_CONTEXT)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        hdrs = {"Accept": "application/json", "User-Agent": "IPanalyse"}
+        hdrs.update(headers or {})
+        with self._slots:
+            for attempt in (0, 1):
+                try:
+                    conn = self._idle.get_nowait(); reused = True
+                except queue.Empty:
+                    conn = self._connect(); reused = False
+                try:
+                    conn.request(method, path, body=body, headers=hdrs)
+                    resp = conn.getresponse()
+                    data = resp.read()
+                except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                        ConnectionResetError, BrokenPipeError):
+                    # connexion keep-alive fermée côté serveur : un seul nouvel essai
+                    conn.close()
+                    if reused and attempt == 0: continue
+                    raise
+                except Exception:
+                    conn.close()
+                    raise
+                if resp.will_close: conn.close()
+                else: self._idle.put(conn)
+                return resp.status, resp.headers, data
+
+    def close(self):
+        while True:
+            try: self._idle.get_nowait().close()
+            except queue.Empty: break
+
+HTTP_POOLS = {}
+HTTP_SETTINGS = {"pool_size": DEFAULT_HTTP_POOL_SIZE, "timeout": DEFAULT_HTTP_TIMEOUT,
+                 "proxies": urllib.request.getproxies()}
+_HTTP_LOCK = threading.Lock()
+
+def configure_http(pool_size=None, timeout=None):
+    with _HTTP_LOCK:
+        if pool_size: HTTP_SETTINGS["pool_size"] = int(pool_size)
+        if timeout: HTTP_SETTINGS["timeout"] = float(timeout)
+        HTTP_SETTINGS["proxies"] = urllib.request.getproxies()
+        for pool in HTTP_POOLS.values(): pool.close()
+        HTTP_POOLS.clear()
+
+def http_request(service, url, method="GET", body=None, headers=None):
+    # -> (status, en-têtes, corps brut) ; une réserve par (fournisseur, hôte)
+    u = urllib.parse.urlsplit(url)
+    if u.scheme in HTTP_SETTINGS["proxies"]:
+        # proxy système : on laisse urllib gérer (pas de réutilisation)
+        req = urllib.request.Request(url, data=body, headers=headers or {}, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=HTTP_SETTINGS["timeout"]) as r:
+                return r.status, r.headers, r.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+    key = (service, u.scheme, u.netloc)
+    with _HTTP_LOCK:
+        pool = HTTP_POOLS.get(key)
+        if pool is None:
+            pool = HTTP_POOLS[key] = HttpPool(u.scheme, u.hostname, u.port,
+                                              HTTP_SETTINGS["pool_size"], HTTP_SETTINGS["timeout"])
+    path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+    return pool.request(method, path, body=body, headers=headers)
+
+# =========================
+# QUOTAS FOURNISSEURS
+# =========================
+class RateLimiter:
+    # Quota annoncé par le serveur : X-Rl = requêtes restantes, X-Ttl = secondes avant
+    # remise à zéro. Tant qu'aucun en-tête n'a été reçu, on suppose le quota nominal.
+    def __init__(self, limit, window=60):
+        self.limit = max(1, int(limit)); self.window = window
+        self._lock = threading.Lock()
+        self._remaining = self.limit
+        self._reset_at = time.monotonic() + window
+        self._inflight = 0
+
+    def acquire(self, stop=None):
+        # Réserve une requête ; attend la fenêtre suivante si le quota est épuisé
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._reset_at:
+                    self._remaining = self.limit; self._reset_at = now + self.window
+                if self._remaining > 0:
+                    self._remaining -= 1; self._inflight += 1
+                    return True
+                wait = min(self._reset_at - now, 0.5)
+            if stop is None: time.sleep(wait)
+            elif stop.wait(wait): return False
+
+    def update(self, headers, status):
+        with self._lock:
+            self._inflight = max(0, self._inflight - 1)
+            try:
+                rl, ttl = int(headers.get("X-Rl")), int(headers.get("X-Ttl"))
+            except (TypeError, ValueError):
+                rl = ttl = None
+            now = time.monotonic()
+            if ttl is not None:
+                # les requêtes déjà parties consommeront aussi le quota restant
+                self._reset_at = now + ttl
+                self._remaining = max(0, rl - self._inflight)
+            if status == 429:
+                self._remaining = 0
+                if ttl is None: self._reset_at = max(self._reset_at, now + 1)
+
+    def release(self):
+        with self._lock:
+            self._inflight = max(0, self._inflight - 1)
+
+    def eta(self, requests):
+        # Délai minimal (s) imposé par le quota pour envoyer encore `requests` requêtes
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._reset_at:
+                remaining, ttl = self.limit, 0.0
+            else:
+                remaining, ttl = self._remaining, self._reset_at - now
+        if requests <= remaining: return 0.0
+        return ttl + (math.ceil((requests - remaining) / self.limit) - 1) * self.window
+
+RATE_LIMITERS = {}
+
+def rate_limiter(service, batch=False):
+    spec = SERVICES[service].get("batch") if batch else SERVICES[service]
+    if not spec or not spec.get("rate_limit"): return None
+    with _HTTP_LOCK:
+        key = (service, batch)
+        if key not in RATE_LIMITERS:
+            RATE_LIMITERS[key] = RateLimiter(spec["rate_limit"])
+        return RATE_LIMITERS[key]
+
+def provider_request(service, url, batch=False, stop=None, method="GET", body=None, headers=None):
+    # http_request cadencé par le quota du fournisseur ; un 429 attend la fenêtre suivante
+    limiter = rate_limiter(service, batch)
+    if limiter is None:
+        return http_request(service, url, method=method, body=body, headers=headers)
+    while True:
+        if not limiter.acquire(stop):
+            raise InterruptedError("analyse annulée")
+        try:
+            status, hdrs, data = http_request(service, url, method=method, body=body, headers=headers)
+        except Exception:
+            limiter.release()
+            raise
+        limiter.update(hdrs, status)
+        if status != 429: return status, hdrs, data
+
+TIMED_OUT = ("timed out", "timed out", "N/A")
+BATCH_REFUSED = set()   # fournisseurs dont l'endpoint de lot a répondu 4xx pendant l'analyse en cours
+TRANSIENT_STATUSES = (408, 429)   # 4xx passagers : le lot reste "timed out" et repasse au tour suivant
+
+def batch_spec(service):
+    # Endpoint de lot du fournisseur, sauf s'il a été refusé pendant cette analyse
+    return None if service in BATCH_REFUSED else SERVICES[service].get("batch")
+
+def _ip2proxy_info(ptype, cname):
+    if cname and isinstance(cname, str) and cname.upper() in COUNTRY_CODES:
+        country=COUNTRY_CODES[cname.upper()]
+    else:
+        country=cname if cname else "N/A"
+    return country, f"Oui (IP2Proxy:{ptype})", "N/A"
+
+def local_ip_info(ip):
+    # Classification sans réseau (privée / IP2Proxy) ; None si un lookup est nécessaire
+    if is_private_ip(ip): 
+        return "Privée","N/A","N/A"
+
+    ptype,cname=ip2proxy_lookup(ip)
+    if ptype:
+        return _ip2proxy_info(ptype, cname)
+    return None
+
+# Blocs IPv4 à usage spécial : sur-ensemble de ce que ipaddress juge privé.
+# Seules les IP qui y tombent sont confirmées une à une par is_private_ip.
+SPECIAL_IPV4_NETWORKS = (
+    "0.0.0.0/8", "10.0.0.0/8", "100.64.0.0/10", "127.0.0.0/8", "169.254.0.0/16",
+    "172.16.0.0/12", "192.0.0.0/24", "192.0.2.0/24", "192.88.99.0/24", "192.168.0.0/16",
+    "198.18.0.0/15", "198.51.100.0/24", "203.0.113.0/24", "224.0.0.0/3",
+)
+_SPECIAL_IPV4_BOUNDS = None
+
+def _special_ipv4_bounds():
+    global _SPECIAL_IPV4_BOUNDS
+    if _SPECIAL_IPV4_BOUNDS is None:
+        nets = sorted(ipaddress.ip_network(n) for n in SPECIAL_IPV4_NETWORKS)
+        _SPECIAL_IPV4_BOUNDS = (np.array([int(n.network_address) for n in nets], dtype=np.uint32),
+                                np.array([int(n.broadcast_address) for n in nets], dtype=np.uint32))
+    return _SPECIAL_IPV4_BOUNDS
+
+def local_ip_info_bulk(v4, ints):
+    # Classification locale des IPv4 distinctes d'une analyse en une passe vectorisée
+    # (blocs spéciaux puis plages IP2Proxy par np.searchsorted). v4 : chaînes IP,
+    # ints : leurs entiers déjà analysés (même ordre, pas de nouvelle analyse).
+    # Retourne {ip: (pays, vpn, opérateur)} pour les seules IP résolues sans réseau.
+    if np is None or not v4:
+        return {ip: info for ip in v4 if (info := local_ip_info(ip))}
+    found = {}
+    ints = np.asarray(ints, dtype=np.uint32)
+    lo, hi = _special_ipv4_bounds()
+    pos = np.searchsorted(lo, ints, side="right") - 1
+    special = pos >= 0
+    special[special] = ints[special] <= hi[pos[special]]
+
+    for i in np.flatnonzero(special).tolist():
+        if is_private_ip(v4[i]):
+            found[v4[i]] = ("Privée","N/A","N/A")
+    if IP2P_INDEX:
+        rest = np.array([i for i in range(len(v4)) if v4[i] not in found], dtype=np.intp)
+        for j, (ptype, cname) in IP2P_INDEX.lookup_many(ints[rest]).items():
+            found[v4[rest[j]]] = _ip2proxy_info(ptype, cname)
+    return found
+
+def service_url(service, api_key, ip=None, batch=False):
+    tpl = SERVICES[service]["batch"]["url"] if batch else SERVICES[service]["url"]
+    return (tpl.format(ip=ip,key=api_key)
+            if SERVICES[service]["requires_key"]
+            else tpl.format(ip=ip))
+
+def parse_service_data(service, data):
+    # Normalise la réponse JSON d'un fournisseur en (pays, vpn, opérateur)
+    pays,vpn,operateur="N/A","N/A","N/A"
+    if not isinstance(data, dict):
+        return pays,vpn,operateur
+    if service=="ip-api" and data.get("status")=="success":
+        code=data.get("countryCode","N/A")
+        pays=COUNTRY_CODES.get(code,code)
+        vpn="Oui (Hosting)" if data.get("hosting") else "Non"
+        operateur = data.get("isp") or data.get("org") or data.get("asname") or data.get("as") or "N/A"
+    elif service=="ipdata" and "country_code" in data:
+        code=data["country_code"]
+        pays=COUNTRY_CODES.get(code,code)
+        vpn="Oui (ipdata)" if data.get("threat",{}).get("is_proxy") else "Non"
+        operateur = (
+            (data.get("company") or {}).get("name")
+            or (data.get("asn") or {}).get("name")
+            or (data.get("carrier") or {}).get("name")
+            or "N/A"
+        )
+    elif service=="ipqualityscore" and "country_code" in data:
+        code=data["country_code"]
+        pays=COUNTRY_CODES.get(code,code)
+        vpn="Oui (IPQS)" if data.get("vpn") else "Non"
+        operateur = data.get("ISP") or data.get("isp") or data.get("ASN") or "N/A"
+    return pays,vpn,operateur
+
+def fetch_ip_info(ip, api_key=None, stop=None):
+    service=detect_service(api_key)
+    try:
+        status, _, body = provider_request(service, service_url(service, api_key, ip=ip), stop=stop)
+        if status >= 400: return TIMED_OUT
+        return parse_service_data(service, json.loads(body.decode()))
+    except:
+        return TIMED_OUT
+
+def fetch_ip_info_batch(ips, api_key=None, stop=None):
+    # Un seul POST pour un lot d'IP ; les IP absentes de la réponse restent "timed out".
+    # Lot refusé (4xx, ex. clé sans accès bulk) : IP une à une, et plus de lot pour ce fournisseur.
+    # 408 / 429 ne sont pas un refus : le lot est réessayé avec attente croissante (resolve_ips).
+    service=detect_service(api_key)
+    if service in BATCH_REFUSED:
+        return {ip: fetch_ip_info(ip, api_key, stop) for ip in ips}
+    found={ip: TIMED_OUT for ip in ips}
+    try:
+        status, _, body = provider_request(service, service_url(service, api_key, batch=True), batch=True,
+                                           stop=stop, method="POST", body=json.dumps(list(ips)).encode(),
+                                           headers={"Content-Type":"application/json"})
+        if status in TRANSIENT_STATUSES: return found
+        if 400 <= status < 500:
+            with _HTTP_LOCK:
+                BATCH_REFUSED.add(service)
+            return {ip: fetch_ip_info(ip, api_key, stop) for ip in ips}
+        if status >= 400: return found
+        data=json.loads(body.decode())
+    except:
+        return found
+    if isinstance(data, dict):
+        # ipdata peut renvoyer un objet indexé par IP
+        data=[data.get(ip) for ip in ips]
+    for ip, item in zip(ips, data if isinstance(data, list) else []):
+        key = (item.get("query") or item.get("ip")) if isinstance(item, dict) else None
+        found[key if key in found else ip]=parse_service_data(service, item)
+    return found
+
+def get_ip_info(ip,api_key=None):
+    return local_ip_info(ip) or fetch_ip_info(ip, api_key)
+
+# =========================
+# CACHE PERSISTANT (SQLite)
+# =========================
+class EnrichmentCache:
+    # (pays, vpn, opérateur) par (ip, fournisseur), conservés entre les exécutions.
+    # Les "timed out" ont leur propre durée de vie (courte) ; au-delà de
+    # max_entries, les entrées les moins récemment utilisées sont évincées.
+    def __init__(self, path=CACHE_FILE, ttl_days=DEFAULT_CACHE_TTL_DAYS,
+                 negative_ttl_min=DEFAULT_CACHE_NEGATIVE_TTL_MIN, max_entries=DEFAULT_CACHE_MAX_ENTRIES):
+        self.ttl = float(ttl_days) * 86400
+        self.negative_ttl = float(negative_ttl_min) * 60
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS lookups ("
+                         "ip TEXT NOT NULL, provider TEXT NOT NULL, pays TEXT, vpn TEXT, oper TEXT, "
+                         "created REAL NOT NULL, used REAL NOT NULL, PRIMARY KEY (ip, provider))")
+        self._db.execute("CREATE INDEX IF NOT EXISTS lookups_used ON lookups(used)")
+        self._db.commit()
+
+    def get_many(self, ips, provider):
+        now = time.time(); found = {}
+        with self._lock:
+            for i in range(0, len(ips), 500):
+                chunk = ips[i:i+500]
+                marks = ",".join("?" * len(chunk))
+                for ip, pays, vpn, oper, created in self._db.execute(
+                        f"SELECT ip, pays, vpn, oper, created FROM lookups WHERE provider=? AND ip IN ({marks})",
+                        [provider, *chunk]):
+                    ttl = self.negative_ttl if pays == "timed out" else self.ttl
+                    if now - created <= ttl:
+                        found[ip] = (pays, vpn, oper)
+            if found:
+                self._db.executemany("UPDATE lookups SET used=? WHERE ip=? AND provider=?",
+                                     [(now, ip, provider) for ip in found])
+                self._db.commit()
+        self.hits += len(found)
+        return found
+
+    def put_many(self, items, provider):
+        now = time.time()
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO lookups VALUES (?,?,?,?,?,?,?)",
+                                 [(ip, provider, p, v, o, now, now) for ip, (p, v, o) in items.items()])
+            self._db.commit()
+
+    def prune(self):
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM lookups WHERE created < ? OR (pays='timed out' AND created < ?)",
+                             (now - self.ttl, now - self.negative_ttl))
+            n = self._db.execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+            if n > self.max_entries:
+                self._db.execute("DELETE FROM lookups WHERE rowid IN "
+                                 "(SELECT rowid FROM lookups ORDER BY used LIMIT ?)", (n - self.max_entries,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+# =========================
+# RÉSOLUTION CONCURRENTE
+# =========================
+def _lookup_round(ips, api_key, max_workers, stop=None, on_done=None):
+    found = {}
+    if not ips: return found
+    # une IP isolée passe par l'endpoint unitaire, au quota bien moins serré que /batch
+    batch = batch_spec(detect_service(api_key)) if len(ips) > 1 else None
+    pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)))
+    try:
+        if batch:
+            size = max(1, int(batch.get("size", 100)))
+            futures = {pool.submit(fetch_ip_info_batch, ips[i:i+size], api_key, stop): ips[i:i+size]
+                       for i in range(0, len(ips), size)}
+        else:
+            futures = {pool.submit(fetch_ip_info, ip, api_key, stop): [ip] for ip in ips}
+        for fut in as_completed(futures):
+            chunk = futures[fut]
+            try:
+                res = fut.result()
+                if not batch: res = {chunk[0]: res}
+            except Exception:
+                res = {}
+            for ip in chunk:
+                found[ip] = res.get(ip, TIMED_OUT)
+            if on_done: on_done(len(chunk))
+            if stop is not None and stop.is_set():
+                break
+    finally:
+        # arrêt ou exception (ex. KeyboardInterrupt) : les lookups en file ne sont pas lancés
+        pool.shutdown(wait=True, cancel_futures=True)
+    return found
+
+def resolve_ips(pending, api_key=None, cache=None, timeouts=None,
+                max_workers=DEFAULT_LOOKUP_WORKERS, stop=None, on_progress=None, store=None,
+                retries=LOOKUP_RETRIES, backoff=LOOKUP_BACKOFF, addresses=None):
+    # pending : {ip: date de première occurrence}, dans l'ordre d'apparition.
+    # Remplit cache[ip] = (pays, vpn, opérateur) ; les IP encore "timed out"
+    # après `retries` nouveaux essais sont ajoutées à timeouts sous forme (date, ip).
+    # store : EnrichmentCache optionnel consulté avant le réseau.
+    # addresses : {ip: (version, entier)} de la passe 1, sinon chaque IP est analysée ici.
+    # on_progress(fait, total, eta) : eta = secondes restantes estimées (débit + quota).
+    if cache is None: cache = {}
+    if timeouts is None: timeouts = []
+    todo = [ip for ip in pending if ip not in cache]
+
+    # Privées / IP2Proxy : aucun appel réseau, jamais mis en cache disque
+    found = {}
+    v4, ints = [], []
+    for ip in todo:
+        addr = addresses[ip] if addresses is not None else parse_ip(ip)
+        if addr is not None and addr[0] == 4:
+            v4.append(ip); ints.append(addr[1])
+        elif (info := local_ip_info(ip)):
+            found[ip] = info
+    found.update(local_ip_info_bulk(v4, ints))
+    remote = [ip for ip in todo if ip not in found]
+
+    provider = detect_service(api_key)
+    if store is not None and remote:
+        known = store.get_many(remote, provider)
+        found.update(known)
+        remote = [ip for ip in remote if ip not in known]
+
+    batch = batch_spec(provider) if len(remote) > 1 else None   # cf. _lookup_round
+    per_request = max(1, int(batch.get("size", 100))) if batch else 1
+    limiter = rate_limiter(provider, bool(batch))
+    state = {"done": 0, "total": len(remote), "start": time.monotonic()}
+
+    def tick(n=1):
+        state["done"] += n
+        if not on_progress: return
+        left = state["total"] - state["done"]
+        elapsed = time.monotonic() - state["start"]
+        eta = elapsed / state["done"] * left if state["done"] else 0.0
+        if limiter is not None:
+            eta = max(eta, limiter.eta(math.ceil(left / per_request)))
+        on_progress(state["done"], state["total"], eta)
+
+    found.update(_lookup_round(remote, api_key, max_workers, stop, tick))
+    if stop is not None and stop.is_set():
+        return cache
+
+    # Nouveaux essais des timeouts, avec attente croissante entre les tours
+    for attempt in range(max(0, int(retries))):
+        retry = [ip for ip in remote if found[ip][0] == "timed out"]
+        if not retry: break
+        delay = backoff * (2 ** attempt)
+        if stop is None: time.sleep(delay)
+        elif stop.wait(delay): return cache
+        state["total"] += len(retry)
+        found.update({ip: r for ip, r in _lookup_round(retry, api_key, max_workers, stop, tick).items()
+                      if r[0] != "timed out"})
+        if stop is not None and stop.is_set():
+            return cache
+
+    if store is not None and remote:
+        store.put_many({ip: found[ip] for ip in remote}, provider)
+    for ip in todo:
+        if found[ip][0] == "timed out":
+            timeouts.append((pending[ip], ip))
+        cache[ip] = found[ip]
+    return cache
+
+# =========================
+# EXPORTS HTML / PDF
+# =========================
+def export_html(results, exclusions, timeouts, suspects, country_counts,
+                habitudes_out_sorted=None, habitudes_in_sorted=None, unusual_list=None,
+                prefix_freq=None, suspect_hits=None, suspect_windows_str="",
+                base_dir=".", prefix="Rapport_complet", main_country="France",
+                total_rows=0, excluded_count=0, prefix_freq_v6=None, suspect_hits_by_window=None,
+                ipv6_count=0, progress=None, open_browser=True):
+    # results : ResultStore ; unusual_list, suspect_hits et habitudes : indices de lignes
+    # progress(message) : appelé pendant l'écriture (facultatif)
+    os.makedirs(base_dir, exist_ok=True)
+    date_str = datetime.now().strftime("%d%m")
+    filename = f"{prefix}_{date_str}.html"
+    filepath = os.path.join(base_dir, filename)
+    counter = 2
+    while os.path.exists(filepath):
+        filename = f"{prefix}_{date_str}_{counter}.html"
+        filepath = os.path.join(base_dir, filename)
+        counter += 1
+
+    parts = html_report_parts(
+        filename, results, exclusions, timeouts, suspects, country_counts,
+        habitudes_out_sorted=habitudes_out_sorted or [], habitudes_in_sorted=habitudes_in_sorted or [],
+        unusual_list=unusual_list or [], prefix_freq=prefix_freq, suspect_hits=suspect_hits,
+        suspect_windows_str=suspect_windows_str, main_country=main_country, total_rows=total_rows,
+        excluded_count=excluded_count, prefix_freq_v6=prefix_freq_v6, suspect_hits_by_window=suspect_hits_by_window,
+        ipv6_count=ipv6_count)
+    # rapport écrit section par section au fil de la génération (tampon fichier)
+    with open(filepath, "w", encoding="utf-8", buffering=HTML_WRITE_BUFFER) as f:
+        if progress is None:
+            f.writelines(parts)
+        else:
+            written, next_report = 0, REPORT_PROGRESS_CHARS
+            for part in parts:
+                f.write(part)
+                written += len(part)
+                if written >= next_report:
+                    progress(f"HTML : {written >> 20} Mo écrits…")
+                    next_report += REPORT_PROGRESS_CHARS
+    if open_browser:
+        webbrowser.open('file://' + os.path.realpath(filepath))
+    return filepath
+
+def html_report_parts(filename, results, exclusions, timeouts, suspects, country_counts,
+                      habitudes_out_sorted, habitudes_in_sorted, unusual_list, prefix_freq, suspect_hits,
+                      suspect_windows_str, main_country, total_rows, excluded_count,
+                      prefix_freq_v6=None, suspect_hits_by_window=None, ipv6_count=0):
+    # Fragments successifs du rapport HTML (générateur : rien n'est accumulé en mémoire)
+    yield f"""
+<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>{filename}</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet/dist/leaflet.css"/>
+<script src="https://unpkg.com/leaflet/dist/leaflet.js"></script>
+<style>
+ body {{
+   font-family: 'Segoe UI', Tahoma, sans-serif;
+   margin: 0; padding: 0;
+   background: #0f1419; color: #e6edf3;
+ }}
+ a {{ color: #58a6ff; }}
+ header {{
+   background: #111827; color: #e6edf3; border-bottom: 1px solid #1f2937;
+   padding: 20px; text-align: center; font-size: 24px;
+ }}
+ section {{
+   background: #0b1220; margin: 20px auto; padding: 20px;
+   max-width: 1100px; border-radius: 10px; border: 1px solid #1f2937;
+ }}
+ h2 {{
+   margin-top: 0; color: #e6edf3; border-bottom: 1px solid #1f2937; padding-bottom: 6px;
+ }}
+ table {{
+   border-collapse: collapse; width: 100%; margin-top: 15px; font-size: 14px;
+ }}
+ th, td {{
+   border: 1px solid #1f2937; padding: 8px; text-align: left;
+ }}
+ th {{
+   background: #111827; color: #e6edf3;
+ }}
+ tr:nth-child(even) {{ background: #0e1726; }}
+ .badge {{
+   display: inline-block; padding: 3px 8px; border-radius: 6px; font-size: 12px; font-weight: bold; color: white;
+ }}
+ .score-high {{ background: #ef4444; }}
+ .score-mid  {{ background: #f59e0b; }}
+ .score-low  {{ background: #10b981; }}
+ .kpis {{
+   display:grid; grid-template-columns: repeat(auto-fit, minmax(180px,1fr)); gap:10px;
+ }}
+ .kpi {{
+   background:#0e1726; border:1px solid #1f2937; border-radius:10px; padding:12px;
+ }}
+ .kpi b {{ font-size:20px; color:#e6edf3; }}
+ .vt {{ table-layout: fixed; margin-top: 0; }}
+ .vt td {{ white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
+ #vt-head th {{ cursor: pointer; user-select: none; }}
+ #vt-head th::after {{ content: attr(data-sort); margin-left: 4px; }}
+ #vt-scroll {{ position: relative; height: 560px; overflow-y: auto; margin-top: -1px; }}
+ #vt-body {{ position: absolute; top: 0; left: 0; }}
+ #vt-body tr:nth-child(even) {{ background: none; }}
+ #vt-body tr.alt {{ background: #0e1726; }}
+ .vt-filters {{ display: flex; gap: 8px; align-items: center; flex-wrap: wrap; }}
+ .vt-filters input {{
+   background: #0e1726; color: #e6edf3; border: 1px solid #1f2937; border-radius: 6px; padding: 6px 8px;
+ }}
+ #vt-count {{ margin-left: auto; color: #9ca3af; }}
+ @page {{ size: A4; margin: 12mm; }}
+ @media print {{
+   html, body {{ -webkit-print-color-adjust: exact; print-color-adjust: exact; background: white; color: black; }}
+   header {{ box-shadow: none; }}
+ }}
+</style>
+</head>
+<body>
+<header>📊 Rapport d'analyse IP – {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}</header>
+"""
+
+    # Résumé rapide
+    yield "<section><h2>🧭 Résumé rapide</h2><div class='kpis'>"
+    yield f"<div class='kpi'><div>Total lignes CSV</div><b>{total_rows}</b></div>"
+    yield f"<div class='kpi'><div>Connexions analysées</div><b>{len(results)}</b></div>"
+    yield f"<div class='kpi'><div>Pays détectés</div><b>{len(country_counts)}</b></div>"
+    yield f"<div class='kpi'><div>IP suspectes</div><b>{len(suspects)}</b></div>"
+    yield f"<div class='kpi'><div>IP exclues</div><b>{excluded_count}</b></div>"
+    yield f"<div class='kpi'><div>Timed out</div><b>{len(timeouts)}</b></div>"
+    yield f"<div class='kpi'><div>Pays principal</div><b>{main_country}</b></div>"
+    yield f"<div class='kpi'><div>Connexions IPv6</div><b>{ipv6_count}</b></div>"
+    yield "</div></section>"
+
+    # Suspects (avec ISP)
+    yield "<section><h2>🚨 IP suspectes</h2>"
+    if suspects:
+        yield "<table><tr><th>IP</th><th>Score</th><th>Nb</th><th>Pays</th><th>ISP</th><th>Raisons</th></tr>"
+        for s in suspects:
+            cls="score-low"
+            if s["score"]>=70: cls="score-high"
+            elif s["score"]>=40: cls="score-mid"
+            yield f"<tr><td>{s['ip']}</td><td><span class='badge {cls}'>{s['score']}</span></td><td>{s['count']}</td><td>{s['country']}</td><td>{s.get('isp','N/A')}</td><td>{'; '.join(s['reasons'])}</td></tr>"
+        yield "</table>"
+    else:
+        yield "<p>Aucun suspect détecté.</p>"
+    yield "</section>"
+
+    # Fenêtres suspectes (avec opérateur)
+    yield "<section><h2>🕵️ Connexions dans les fenêtres suspectes</h2>"
+    if not suspect_windows_str.strip():
+        yield "<p>Aucune fenêtre définie.</p>"
+    else:
+        yield f"<p><b>Fenêtres :</b> {suspect_windows_str}</p>"
+        if suspect_hits_by_window:
+            yield "<table><tr><th>Fenêtre</th><th>Connexions</th><th>IP distinctes</th></tr>"
+            for label, hits in suspect_hits_by_window:
+                yield f"<tr><td>{label}</td><td>{len(hits)}</td><td>{len({results.ip_ids[i] for i in hits})}</td></tr>"
+            yield "</table>"
+        if suspect_hits:
+            yield "<table><tr><th>Horodatage</th><th>IP</th><th>Pays</th><th>VPN</th><th>Opérateur</th><th>Occurrences IP</th></tr>"
+            for i in suspect_hits:
+                d, ip, pays, vpn, oper = results.row(i)
+                yield f"<tr><td>{d}</td><td>{ip}</td><td>{pays}</td><td>{vpn}</td><td>{oper}</td><td>{results.ip_total(i)}</td></tr>"
+            yield "</table>"
+        else:
+            yield "<p>Aucune connexion dans ces fenêtres.</p>"
+    yield "</section>"
+
+    # /24 fréquents
+    yield "<section><h2>📌 Plage d'adresses IPs revenant le plus fréquemment :</h2>"
+    if prefix_freq:
+        yield "<table><tr><th>Plage /24</th><th>Occurrences</th></tr>"
+        for pref, c in prefix_freq:
+            yield f"<tr><td>{pref}</td><td>{c}</td></tr>"
+        yield "</table>"
+    else:
+        yield "<p>Aucune plage /24 récurrente trouvée.</p>"
+    if prefix_freq_v6:
+        yield "<table><tr><th>Plage IPv6</th><th>Occurrences</th></tr>"
+        for pref, c in prefix_freq_v6:
+            yield f"<tr><td>{pref}</td><td>{c}</td></tr>"
+        yield "</table>"
+    yield "</section>"
+
+    # Carte Leaflet
+    yield "<section><h2>🗺️ Carte des pays détectés</h2>"
+    yield "<div id='map' style='width:100%;height:480px;border-radius:8px;'></div>"
+    yield "<script>var map=L.map('map').setView([20,0],2);"
+    yield "L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',{attribution:'© OpenStreetMap'}).addTo(map);"
+    for country,count in country_counts.items():
+        coord=COUNTRY_COORDS.get(country)
+        if coord:
+            popup=f"{country} : {count} connexion(s)"
+            yield f"L.circleMarker([{coord[0]},{coord[1]}],{{radius:8,color:'red'}}).addTo(map).bindPopup('{popup}');"
+    yield "</script></section>"
+
+    # Inhabituelles (table + ISP)
+    yield "<section><h2>🌙 Connexions horaires inhabituelles</h2>"
+    if unusual_list:
+        yield "<table><tr><th>Horodatage</th><th>IP</th><th>Pays</th><th>ISP</th></tr>"
+        for date_u, ip_u, pays_u, _, oper_u in results.rows(unusual_list):
+            yield f"<tr><td>{date_u}</td><td>{ip_u}</td><td>{pays_u}</td><td>{oper_u}</td></tr>"
+        yield "</table>"
+    else:
+        yield "<p>Aucune connexion inhabituelle détectée.</p>"
+    yield "</section>"
+
+    # Exclusions / timeouts
+    yield "<section><h2>📍 IP exclues</h2>"
+    yield ("<ul>"+"".join(f"<li>{e}</li>" for e in exclusions)+"</ul>") if exclusions else "<p>Aucune</p>"
+    yield "</section>"
+
+    yield "<section><h2>⚠️ IP 'timed out'</h2>"
+    yield ("<ul>"+"".join(f"<li>{t[0]} – {t[1]}</li>" for t in timeouts)+"</ul>") if timeouts else "<p>Aucune</p>"
+    yield "</section>"
+
+    # Habitudes 2 colonnes
+    yield f"<section><h2>🕰️ Habitudes de connexions hors {main_country} / {main_country} (tranches 30 min)</h2>"
+    yield "<div style='display:grid;grid-template-columns:1fr 1fr;gap:16px;'>"
+    yield "<div><h3>Hors {}</h3>".format(main_country)
+    if habitudes_out_sorted:
+        for tranche, connexions in habitudes_out_sorted:
+            yield f"<p><b>{len(connexions)} connexion(s) à {tranche}</b></p><ul>"
+            for c in results.rows(connexions):
+                yield f"<li>{c[0]} – {c[1]} ({c[2]})</li>"
+            yield "</ul>"
+    else:
+        yield "<p>Aucune donnée disponible</p>"
+    yield "</div>"
+    yield "<div><h3>{}</h3>".format(main_country)
+    if habitudes_in_sorted:
+        for tranche, connexions in habitudes_in_sorted:
+            yield f"<p><b>{len(connexions)} connexion(s) à {tranche}</b></p><ul>"
+            for c in results.rows(connexions):
+                yield f"<li>{c[0]} – {c[1]} ({c[2]})</li>"
+            yield "</ul>"
+    else:
+        yield "<p>Aucune donnée disponible</p>"
+    yield "</div>"
+    yield "</div></section>"
+
+    # Tableau complet (avec opérateur) : défilement virtuel, tri et filtres côté navigateur
+    yield from report_table_parts(results)
+
+    yield "</body></html>"
+
+# Tableau complet : rendu des seules lignes visibles (défilement virtuel), tri par
+# clic sur l'entête, filtres IP / pays / VPN / opérateur. Données lues dans #vt-data.
+REPORT_TABLE_SCRIPT = """<script>(function(){
+var D=JSON.parse(document.getElementById('vt-data').textContent);
+var n=D.ip.length, view=[], rowH=37, sortCol=-1, sortDir=1;
+var MAX_H=8000000;   // hauteur d'élément plafonnée par les navigateurs (~17,9 M px Firefox, ~33,5 M px Chrome)
+var scroller=document.getElementById('vt-scroll'), spacer=document.getElementById('vt-spacer');
+var body=document.getElementById('vt-body'), tbody=body.tBodies[0], count=document.getElementById('vt-count');
+var inputs=document.querySelectorAll('.vt-filters input'), heads=document.querySelectorAll('#vt-head th');
+function cell(i,c){ if(c===0) return D.dates[i]; if(c===1) return D.ips[D.ip[i]]; return D.infos[D.info[i]][c-2]; }
+function ranks(values){ var order=values.map(function(v,k){return k;});
+  order.sort(function(a,b){ return values[a]<values[b]?-1:values[a]>values[b]?1:0; });
+  var r=new Int32Array(values.length); order.forEach(function(k,pos){ r[k]=pos; }); return r; }
+var infoRank=[];
+function key(c){
+  if(c===0) return function(i){ return D.t[i]; };
+  if(c===1) return function(i){ return D.ipr[D.ip[i]]; };
+  var k=c-2; infoRank[k]=infoRank[k]||ranks(D.infos.map(function(x){return String(x[k]);}));
+  return function(i){ return infoRank[k][D.info[i]]; };
+}
+function matches(values, text){ var ok=new Uint8Array(values.length);
+  for(var k=0;k<values.length;k++) ok[k]=String(values[k]).toLowerCase().indexOf(text)>=0; return ok; }
+function rebuild(){
+  var ipOk=null, infoOk=null, f=[];
+  inputs.forEach(function(inp){ var t=inp.value.trim().toLowerCase(); if(t) f.push([+inp.dataset.col,t]); });
+  f.forEach(function(x){
+    if(x[0]===1){ ipOk=matches(D.ips,x[1]); return; }
+    var m=matches(D.infos.map(function(v){return v[x[0]-2];}),x[1]);
+    if(infoOk){ for(var k=0;k<m.length;k++) infoOk[k]&=m[k]; } else infoOk=m;
+  });
+  view=[];
+  for(var i=0;i<n;i++){ if((!ipOk||ipOk[D.ip[i]])&&(!infoOk||infoOk[D.info[i]])) view.push(i); }
+  if(sortCol>=0){ var kf=key(sortCol);
+    view.sort(function(a,b){ var x=kf(a), y=kf(b); return x===y?a-b:(x<y?-sortDir:sortDir); }); }
+  count.textContent=view.length+' / '+n+' ligne(s)';
+  sizeSpacer(); scroller.scrollTop=0; render();
+}
+function sizeSpacer(){ spacer.style.height=Math.min(view.length*rowH,MAX_H)+'px'; }
+function offset(){
+  // scrollTop -> position dans le tableau complet (mise à l'échelle au-delà de MAX_H)
+  var top=scroller.scrollTop, full=view.length*rowH-scroller.clientHeight;
+  var max=Math.min(view.length*rowH,MAX_H)-scroller.clientHeight;
+  return (max>0&&full>max)?top*full/max:top;
+}
+function render(){
+  var top=scroller.scrollTop, pos=offset();
+  var first=Math.max(0,Math.floor(pos/rowH)-10);
+  var last=Math.min(view.length, first+Math.ceil(scroller.clientHeight/rowH)+20);
+  var frag=document.createDocumentFragment();
+  for(var p=first;p<last;p++){ var tr=document.createElement('tr'), i=view[p];
+    if(p%2) tr.className='alt';   // rayure selon le rang absolu, pas la position dans le fragment
+    for(var c=0;c<5;c++){ var td=document.createElement('td'); td.textContent=cell(i,c); tr.appendChild(td); }
+    frag.appendChild(tr); }
+  tbody.replaceChildren(frag);
+  body.style.transform='translateY('+(top+first*rowH-pos)+'px)';
+  if(tbody.rows.length){ var h=tbody.rows[0].getBoundingClientRect().height;
+    if(h&&Math.abs(h-rowH)>0.5){ rowH=h; sizeSpacer(); } }
+}
+var timer=null;
+inputs.forEach(function(inp){ inp.addEventListener('input',function(){ clearTimeout(timer); timer=setTimeout(rebuild,150); }); });
+heads.forEach(function(th){ th.addEventListener('click',function(){ var c=+th.dataset.col;
+  sortDir=(sortCol===c)?-sortDir:1; sortCol=c;
+  heads.forEach(function(h){ h.dataset.sort=''; }); th.dataset.sort=sortDir>0?'▲':'▼'; rebuild(); }); });
+scroller.addEventListener('scroll',function(){ window.requestAnimationFrame(render); });
+rebuild();
+})();</script>"""
+
+def json_array_parts(values, chunk=10000):
+    # Tableau JSON produit par morceaux ; "<" échappé pour ne jamais fermer le <script>
+    yield "["
+    for start in range(0, len(values), chunk):
+        if start: yield ","
+        yield json.dumps(list(values[start:start+chunk]), ensure_ascii=False)[1:-1].replace("<", "\\u003c")
+    yield "]"
+
+def report_table_parts(results):
+    # Tableau complet : données en JSON colonnes (dictionnaires IP / triplets) + script de rendu
+    cols = "<colgroup><col style='width:22%'><col style='width:18%'><col style='width:16%'><col style='width:16%'><col style='width:28%'></colgroup>"
+    yield "<section><h2>📋 Tableau complet</h2>"
+    yield ("<div class='vt-filters'><input data-col='1' placeholder='Filtrer IP'><input data-col='2' placeholder='Filtrer pays'>"
+           "<input data-col='3' placeholder='Filtrer VPN'><input data-col='4' placeholder='Filtrer opérateur'><span id='vt-count'></span></div>")
+    yield (f"<table class='vt' id='vt-head'>{cols}<tr><th data-col='0'>Date</th><th data-col='1'>IP</th>"
+           "<th data-col='2'>Pays</th><th data-col='3'>VPN</th><th data-col='4'>Opérateur</th></tr></table>")
+    yield (f"<div id='vt-scroll'><div id='vt-spacer'></div>"
+           f"<table class='vt' id='vt-body'>{cols}<tbody></tbody></table></div>")
+    # Rang de chaque IP dans l'ordre numérique (IPv4 puis IPv6) pour le tri par IP
+    order = sorted(range(len(results.ips)), key=lambda k: parse_ip(results.ips[k]) or (7, results.ips[k]))
+    ip_rank = [0] * len(order)
+    for pos, k in enumerate(order):
+        ip_rank[k] = pos
+    yield "<script type='application/json' id='vt-data'>"
+    for name, values in (("dates", results.dates), ("t", results.times), ("ips", results.ips),
+                         ("ip", results.ip_ids), ("ipr", ip_rank), ("infos", results.infos), ("info", results.info_ids)):
+        yield ('{"' if name == "dates" else ',"') + name + '":'
+        yield from json_array_parts(values)
+    yield "}</script>"
+    yield REPORT_TABLE_SCRIPT
+    yield "</section>"
+
+# =========================
+# PIPELINE
+# =========================
+def open_decompressed(raw):
+    # Flux binaire décompressé à la volée, d'après les premiers octets (gzip, bz2, xz, zstd)
+    head = raw.peek(8)[:8]
+    if head.startswith(b"\x1f\x8b"): return gzip.GzipFile(fileobj=raw, mode="rb")
+    if head.startswith(b"BZh"): return bz2.BZ2File(raw, "rb")
+    if head.startswith(b"\xfd7zXZ\x00"): return lzma.LZMAFile(raw, "rb")
+    if head.startswith(b"\x28\xb5\x2f\xfd"):
+        try:
+            from compression import zstd   # Python 3.14+
+            return zstd.ZstdFile(raw, "rb")
+        except ImportError:
+            pass
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("Fichier zstd : installez le module 'zstandard' (pip install zstandard)")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+    return raw
+
+class CsvSource:
+    # Lignes du CSV lues à la demande ; chaque itération relit le fichier (une passe).
+    # Compression détectée et décodée en flux ; séparateur détecté sur le premier
+    # bloc décompressé, entête "date…" sauté ; position = octets du fichier lus.
+    def __init__(self, path, sample_size=4096):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.position = 0
+        with open(path, "rb") as raw, open_decompressed(raw) as stream:
+            sample = io.TextIOWrapper(stream, encoding="utf-8", newline="").read(sample_size + 1)
+        cut = len(sample) > sample_size   # fichier plus long que l'échantillon
+        sample = sample[:sample_size]
+        try:
+            self.dialect = csv.Sniffer().sniff(sample, delimiters=",;\t ")
+        except csv.Error:
+            self.dialect = csv.excel
+        # Lignes complètes de l'échantillon : la dernière n'est écartée que si la lecture l'a coupée
+        self.sample_rows = list(csv.reader(io.StringIO(sample), self.dialect))
+        if cut: self.sample_rows = self.sample_rows[:-1]
+
+    def date_parser(self):
+        return DateParser(r[0] for r in self.sample_rows if r)
+
+    def __iter__(self):
+        with open(self.path, "rb") as raw, open_decompressed(raw) as stream:
+            reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8", newline=""), self.dialect)
+            first = True
+            for row in reader:
+                self.position = raw.tell()
+                if first:
+                    first = False
+                    if row and row[0].lower().startswith("date"): continue
+                yield row
+        self.position = self.size
+
+class ResultStore:
+    # Résultats en colonnes : IP et triplets (pays, VPN, opérateur) encodés par dictionnaire,
+    # horodatages analysés en secondes (0 = absent), drapeau "inhabituel" sur un octet.
+    # Les vues dérivées (fenêtres, inhabituelles, habitudes) ne gardent que des indices de ligne.
+    __slots__ = ("dates", "times", "ip_ids", "info_ids", "unusual", "ips", "infos", "ip_counts",
+                 "_ip_index", "_info_index")
+
+    def __init__(self):
+        self.dates = []
+        self.times = array("q")
+        self.ip_ids, self.info_ids = array("I"), array("I")
+        self.unusual = bytearray()
+        self.ips, self.infos = [], []
+        self.ip_counts = array("I")   # lignes par IP
+        self._ip_index, self._info_index = {}, {}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def append(self, date_str, ip, info, dt, unusual=False):
+        ip_id = self._ip_index.get(ip)
+        if ip_id is None:
+            ip_id = self._ip_index[ip] = len(self.ips)
+            self.ips.append(ip); self.ip_counts.append(0)
+        info_id = self._info_index.get(info)
+        if info_id is None:
+            info_id = self._info_index[info] = len(self.infos)
+            self.infos.append(info)
+        self.dates.append(date_str)
+        self.times.append(dt.toordinal()*86400 + dt.hour*3600 + dt.minute*60 + dt.second if dt else 0)
+        self.ip_ids.append(ip_id); self.info_ids.append(info_id)
+        self.unusual.append(1 if unusual else 0)
+        self.ip_counts[ip_id] += 1
+        return len(self.dates) - 1
+
+    def row(self, i):
+        # -> (date, ip, pays, vpn, opérateur)
+        pays, vpn, oper = self.infos[self.info_ids[i]]
+        return self.dates[i], self.ips[self.ip_ids[i]], pays, vpn, oper
+
+    def rows(self, indices=None):
+        return map(self.row, range(len(self)) if indices is None else indices)
+
+    def ip(self, i):
+        return self.ips[self.ip_ids[i]]
+
+    def country(self, i):
+        return self.infos[self.info_ids[i]][0]
+
+    def ip_total(self, i):
+        return self.ip_counts[self.ip_ids[i]]
+
+    def minute(self, i):
+        # minute de la journée, None sans horodatage
+        t = self.times[i]
+        return (t % 86400) // 60 if t else None
+
+    def dt(self, i):
+        t = self.times[i]
+        if not t: return None
+        return datetime.fromordinal(t // 86400) + timedelta(seconds=t % 86400)
+
+class IpStats:
+    # Agrégat incrémental d'une IP pour le score, mis à jour ligne à ligne
+    # (seules les lignes à pays valide comptent, comme pour le score)
+    __slots__ = ("count", "country", "oper", "ip2p", "hosting", "vpn", "unusual")
+
+    def __init__(self):
+        self.count = 0
+        self.country = self.oper = None
+        self.ip2p = self.hosting = self.vpn = False
+        self.unusual = 0
+
+    def add(self, info, unusual):
+        pays, vpn, oper = info
+        if pays in ("N/A", "Privée", "timed out"): return
+        self.count += 1
+        if self.country is None: self.country = pays
+        if self.oper is None and oper and oper != "N/A": self.oper = oper
+        if isinstance(vpn, str) and "Oui" in vpn:
+            self.vpn = True
+            if "IP2Proxy" in vpn: self.ip2p = True
+            if "Hosting" in vpn: self.hosting = True
+        if unusual: self.unusual += 1
+
+def collect_distinct_ips(rows, exclusions, stop=None, on_row=None, window_date=None):
+    # Passe 1 : un seul parcours des lignes, une seule analyse par chaîne IP distincte.
+    # window_date(date) optionnel -> horodatage s'il tombe dans une fenêtre suspecte, sinon
+    # None : seules les lignes d'IP exclues sont datées, une fois pour les deux passes.
+    # Retourne (pending, addresses, excluded, window_rows) :
+    #   pending     = {ip: 1re date} des IP à résoudre en bloc (valides non exclues,
+    #                 puis exclues vues dans une fenêtre)
+    #   addresses   = {ip: (version, entier) | None (invalide)}, analyse mémorisée par IP
+    #   excluded    = IP couvertes par un motif d'exclusion (ExclusionSet)
+    #   window_rows = {n° de ligne (1 = première ligne lue): horodatage} des lignes
+    #                 d'IP exclues dans une fenêtre ; les autres lignes exclues sont écartées
+    pending = {}; addresses = {}; excluded = set(); window_rows = {}
+    line = 0
+    for row in rows:
+        if stop is not None and stop.is_set(): break
+        line += 1
+        if on_row: on_row(len(addresses))
+        if len(row) < 2: continue
+        ip = row[1].strip()
+        if ip not in addresses:
+            addr = addresses[ip] = parse_ip(ip)
+            if addr is None: continue
+            if not exclusions.contains(ip, addr):
+                pending[ip] = row[0].strip()
+                continue
+            excluded.add(ip)
+        if window_date is not None and ip in excluded:
+            date_str = row[0].strip()
+            dt = window_date(date_str)
+            if dt is not None:
+                window_rows[line] = dt
+                pending.setdefault(ip, date_str)
+    return pending, addresses, excluded, window_rows
+
+# =========================
+# PROGRESSION
+# =========================
+PROGRESS_INTERVAL = 0.1   # au plus 10 mises à jour/s vers l'interface
+# type de ligne : (libellé du compteur, message détaillé du journal fichier)
+ROW_KINDS = {
+    "ok":       ("traitées",    "IP ligne {line} traitée"),
+    "ipv6":     ("IPv6",        "IPv6 ligne {line} traitée"),
+    "excluded": ("exclues",     "IP ligne {line} exclue (plage)"),
+    "filtered": ("filtrées",    "IP ligne {line} filtrée (pays ≠ {main_country})"),
+    "invalid":  ("invalides",   "Ligne {line} ignorée (IP invalide)"),
+    "format":   ("hors format", "Ligne {line} ignorée (format)"),
+}
+
+class ProgressReporter:
+    # Regroupe la progression ligne à ligne : compteurs agrégés, émission limitée
+    # dans le temps, et messages détaillés uniquement dans un journal fichier optionnel.
+    def __init__(self, emit, interval=PROGRESS_INTERVAL, verbose_path=None):
+        self.emit = emit
+        self.interval = interval
+        self.counts = Counter()
+        self._last = 0.0
+        self._log = open(verbose_path, "a", encoding="utf-8") if verbose_path else None
+
+    def _due(self):
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
+
+    def message(self, cur, total, msg):
+        # Message d'étape : toujours transmis
+        if self._log: self._log.write(msg + "\n")
+        self._last = time.monotonic()
+        self.emit(cur, total, msg)
+
+    def update(self, cur, total, msg):
+        if self._due(): self.emit(cur, total, msg)
+
+    def row(self, cur, total, kind, line, **extra):
+        # cur / total : octets lus / taille du fichier ; line : n° de ligne (journal)
+        self.counts[kind] += 1
+        if self._log: self._log.write(ROW_KINDS[kind][1].format(line=line, **extra) + "\n")
+        if self._due(): self.emit(cur, total, self.summary(cur, total))
+
+    def summary(self, cur, total):
+        pct = 100 if not total else int(cur * 100 / total)
+        parts = ", ".join(f"{label} {self.counts[k]}" for k, (label, _) in ROW_KINDS.items() if self.counts[k])
+        return f"Lignes {sum(self.counts.values())} ({pct} %) — {parts}"
+
+    def close(self):
+        if self._log:
+            self._log.close(); self._log = None
+
+# =========================
+# ANALYSE (sans Qt)
+# =========================
+class Analysis:
+    # Analyse complète d'un CSV. progress(cur, total, message) reçoit l'avancement ;
+    # stop (threading.Event) interrompt l'analyse, qui renvoie alors {"cancelled": True}.
+    def __init__(self, cfg, progress=None, stop=None):
+        self.cfg = cfg
+        self.progress = progress or (lambda cur, total, msg: None)
+        self._stop = stop if stop is not None else threading.Event()
+        self._store = None
+        self._reporter = None
+
+    def run(self):
+        try:
+            return self._run_core()
+        finally:
+            if self._store is not None:
+                try:
+                    self._store.prune(); self._store.close()
+                except sqlite3.Error:
+                    pass
+                self._store = None
+            if self._reporter is not None:
+                self._reporter.close(); self._reporter = None
+
+    def _open_store(self):
+        if not self.cfg.get("disk_cache", True): return None
+        try:
+            return EnrichmentCache(
+                self.cfg.get("cache_path") or CACHE_FILE,
+                ttl_days=self.cfg.get("cache_ttl_days", DEFAULT_CACHE_TTL_DAYS),
+                negative_ttl_min=self.cfg.get("cache_negative_ttl_min", DEFAULT_CACHE_NEGATIVE_TTL_MIN),
+                max_entries=self.cfg.get("cache_max_entries", DEFAULT_CACHE_MAX_ENTRIES))
+        except sqlite3.Error as e:
+            self.progress(0, 0, f"Cache disque indisponible ({e})")
+            return None
+
+    def _run_core(self):
+        csv_path     = self.cfg["csv_path"]
+        api_key      = self.cfg.get("api_key") or None
+        ip2p_path    = self.cfg.get("ip2p_path","").strip()
+        raw_excl     = self.cfg.get("raw_exclusions","")
+        unusual_txt  = self.cfg.get("unusual_ranges","").strip()
+        suspect_txt  = self.cfg.get("suspect_windows","").strip()
+        main_country = self.cfg.get("main_country","France")
+        weights      = self.cfg.get("weights", DEFAULT_WEIGHTS.copy())
+        exclude_others = self.cfg.get("exclude_others", False)
+        workers      = self.cfg.get("lookup_workers", DEFAULT_LOOKUP_WORKERS)
+
+        local_ipv6_count = 0
+
+        if ip2p_path and (IP2P_INDEX is None or IP2P_INDEX.path != ip2p_path):
+            if not load_ip2proxy(ip2p_path):
+                self.progress(0, 0, f"Base IP2Proxy illisible ou vide ({ip2p_path}) : détection IP2Proxy désactivée")
+
+        rows = CsvSource(csv_path)
+
+        exclusion_set = ExclusionSet(split_exclusions(raw_excl))
+        exclusions = exclusion_set.patterns
+
+        cache={}
+        results=ResultStore()
+        timeouts=[]
+        unusual_list=[]   # indices dans results
+        excluded_count = 0
+        ip_stats = {}   # ip -> IpStats, dans l'ordre de première apparition
+
+        unusual_mask = unusual_minute_mask(parse_unusual_ranges(unusual_txt))
+        window_index = WindowIndex(parse_suspect_windows(suspect_txt))
+        windows_mode = len(window_index) > 0
+        suspect_window_hits = []
+
+        total = rows.size   # progression en octets lus
+        rep = self._reporter = ProgressReporter(self.progress, verbose_path=self.cfg.get("verbose_log") or None)
+        rep.message(0, total, f"{len(exclusions)} motif(s) d'exclusion")
+        if exclusion_set.invalid:
+            rep.message(0, total, f"Motif(s) d'exclusion illisible(s), ignoré(s) : {', '.join(exclusion_set.invalid)}")
+
+        parse_dt = rows.date_parser()   # chaque horodatage n'est analysé qu'une fois
+        if parse_dt.fmt:
+            rep.message(0, total, f"Format d'horodatage détecté : {parse_dt.fmt}")
+
+        # Passe 1 : IP distinctes (analyse, exclusion) sans aucun appel réseau ;
+        # les IP exclues vues dans une fenêtre suspecte sont résolues avec les autres
+        def on_scan(n_ips):
+            rep.update(rows.position, total, f"Passe 1 : {n_ips} IP distincte(s)…")
+        def window_date(date_str):
+            dt = parse_dt(date_str)
+            return dt if window_index.lookup(dt) else None
+        pending, addresses, excluded_ips, window_rows = collect_distinct_ips(
+            rows, exclusion_set, stop=self._stop, on_row=on_scan, window_date=window_date if windows_mode else None)
+        if self._stop.is_set():
+            return {"cancelled": True}
+
+        # Passe 2 : enrichissement en bloc des IP distinctes non exclues
+        def on_lookup(done, n, eta):
+            fin = (datetime.now() + timedelta(seconds=eta)).strftime("%H:%M:%S")
+            rep.update(done, n, f"Résolution {done}/{n} IP… fin estimée {fin}")
+        rep.message(0, len(pending), f"{len(addresses)} IP distincte(s), {len(pending)} à résoudre ({workers} en parallèle)")
+        configure_http(pool_size=self.cfg.get("http_pool_size") or workers,
+                       timeout=self.cfg.get("http_timeout", DEFAULT_HTTP_TIMEOUT))
+        BATCH_REFUSED.clear()   # nouvel essai des endpoints de lot à chaque analyse
+        self._store = self._open_store()
+        resolve_ips(pending, api_key, cache, timeouts, max_workers=workers,
+                    stop=self._stop, on_progress=on_lookup, store=self._store,
+                    retries=self.cfg.get("lookup_retries", LOOKUP_RETRIES), addresses=addresses)
+        if self._stop.is_set():
+            return {"cancelled": True}
+        rep.message(len(pending), len(pending), f"{len(pending)} IP résolue(s), {len(timeouts)} timed out")
+        if self._store is not None:
+            rep.message(len(pending), len(pending), f"Cache disque : {self._store.hits} IP déjà connue(s)")
+
+        # Passe 3 : classification des lignes (fenêtres, exclusions, horaires)
+        total_rows = 0
+        for row in rows:
+            if self._stop.is_set():
+                return {"cancelled": True}
+            total_rows += 1
+
+            if len(row) < 2:
+                rep.row(rows.position, total, "format", total_rows)
+                continue
+
+            date_str, ip = row[0].strip(), row[1].strip()
+
+            # IP invalide (déterminé en passe 1)
+            addr = addresses.get(ip)
+            if addr is None:
+                rep.row(rows.position, total, "invalid", total_rows)
+                continue
+
+            if ip in excluded_ips:
+                # Lignes d'IP exclues datées en passe 1 : hors fenêtre, exclusion immédiate ;
+                # dans une fenêtre, les exclusions IP/pays sont ignorées → traiter tout
+                dt_csv = window_rows.get(total_rows)
+                if dt_csv is None:
+                    excluded_count += 1
+                    rep.row(rows.position, total, "excluded", total_rows)
+                    continue
+            else:
+                dt_csv = parse_dt(date_str)
+            hit_windows = window_index.lookup(dt_csv) if windows_mode else ()
+            in_window = bool(hit_windows)
+
+            # Lookup (résolu en passe 2, y compris les IP exclues vues dans une fenêtre)
+            info = cache[ip]
+            pays = info[0]
+
+            # Exclusion par pays HORS fenêtre ?
+            if (not in_window) and exclude_others and (pays not in ["N/A", "Privée", "timed out"]) and (pays != main_country):
+                rep.row(rows.position, total, "filtered", total_rows, main_country=main_country)
+                continue
+
+            if addr[0] == 6: local_ipv6_count += 1
+            # minute inhabituelle : calculée une seule fois et stockée avec la ligne
+            unusual = bool(dt_csv) and unusual_mask[dt_csv.hour*60 + dt_csv.minute] == 1
+            i = results.append(date_str, ip, info, dt_csv, unusual)
+            stats = ip_stats.get(ip)
+            if stats is None: stats = ip_stats[ip] = IpStats()
+            stats.add(info, unusual)
+            if in_window:
+                suspect_window_hits.append((i, hit_windows))
+
+            if unusual:
+                unusual_list.append(i)
+
+            rep.row(rows.position, total, "ipv6" if addr[0] == 6 else "ok", total_rows)
+        rep.message(total, total, rep.summary(total, total))
+
+        # Post-traitement
+        is_local_isp = isp_matcher(main_country, self.cfg.get("isp_catalogue"))
+        local_code = country_label(main_country)
+
+        def compute_score(stats, main_country, weights):
+            nb = stats.count; score = 0; reasons = []
+            rep_country, rep_oper = stats.country, stats.oper
+
+            if rep_country and rep_country != main_country:
+                score += weights.get("off_country", DEFAULT_WEIGHTS["off_country"]); reasons.append(f"Hors {main_country}")
+
+            if stats.ip2p:
+                score += weights.get("vpn_ip2p", DEFAULT_WEIGHTS["vpn_ip2p"]); reasons.append("Proxy/VPN (IP2Proxy)")
+            elif stats.hosting:
+                score += weights.get("hosting", DEFAULT_WEIGHTS["hosting"]); reasons.append("Hosting (ip-api)")
+            elif stats.vpn:
+                score += weights.get("vpn_other", DEFAULT_WEIGHTS["vpn_other"]); reasons.append("VPN/Proxy")
+
+            if nb == 1:
+                score += weights.get("unique", DEFAULT_WEIGHTS["unique"]); reasons.append("Unique")
+            elif nb <= 4:
+                score += weights.get("few", DEFAULT_WEIGHTS["few"]); reasons.append("Peu fréquent")
+
+            if stats.unusual > 0:
+                score += weights.get("unusual", DEFAULT_WEIGHTS["unusual"]); reasons.append(f"{stats.unusual} horaires inhabituels")
+
+            # ISP du pays principal / hors pays
+            if rep_oper and is_local_isp(rep_oper):
+                score += weights.get("isp_fr", DEFAULT_WEIGHTS["isp_fr"]); reasons.append(f"ISP {local_code}")
+            else:
+                score += weights.get("isp_foreign", DEFAULT_WEIGHTS["isp_foreign"]); reasons.append(f"ISP hors {local_code}/??")
+
+            if score < 0: score = 0
+            if score > 100: score = 100
+            return score, reasons, rep_country, rep_oper
+
+        suspects=[]
+        for ip,stats in ip_stats.items():
+            if not stats.count: continue
+            score, reasons, country, oper = compute_score(stats, main_country, weights)
+            suspects.append({
+                "ip": ip, "score": score, "reasons": reasons, "count": stats.count,
+                "country": country or "N/A", "isp": oper or "N/A"
+            })
+        suspects.sort(key=lambda x:x["score"],reverse=True)
+
+        # comptage par triplet encodé, puis par pays (ordre de première apparition conservé)
+        country_counts = Counter()
+        for info_id, n in Counter(results.info_ids).items():
+            pays = results.infos[info_id][0]
+            if pays not in ["N/A","Privée","timed out"]:
+                country_counts[pays] += n
+
+        # Habitudes 30 min : deux colonnes (hors / dans pays principal), indices de lignes
+        hab_out = defaultdict(list)
+        hab_in  = defaultdict(list)
+        for i in range(len(results)):
+            pays = results.country(i)
+            if pays in ["N/A","Privée","timed out"]:
+                continue
+            minute = results.minute(i)
+            if minute is None:
+                continue
+            key = HABIT_SLOTS[minute // 30]
+            if pays == main_country:
+                hab_in[key].append(i)
+            else:
+                hab_out[key].append(i)
+        habitudes_out_sorted = sorted(hab_out.items(), key=lambda x: len(x[1]), reverse=True)
+        habitudes_in_sorted  = sorted(hab_in.items(),  key=lambda x: len(x[1]), reverse=True)
+
+        prefix_freq = compute_prefix_frequencies(results.rows())
+        prefix_freq_v6 = compute_ipv6_prefix_frequencies(results.rows(), self.cfg.get("ipv6_prefix_len", IPV6_PREFIX_LEN))
+
+        # horodatage absent (0) en tête, comme datetime.min auparavant
+        suspect_window_hits.sort(key=lambda h: results.times[h[0]])
+        suspect_hits = []
+        by_window = [[] for _ in range(len(window_index))]
+        for i, wins in suspect_window_hits:
+            suspect_hits.append(i)
+            for w in wins: by_window[w].append(i)
+        suspect_hits_by_window = [(window_index.label(w), hits) for w, hits in enumerate(by_window)]
+        ip_totals = Counter(dict(zip(results.ips, results.ip_counts)))
+
+        return {
+            "cancelled": False,
+            "results": results,
+            "suspects": suspects,
+            "country_counts": country_counts,
+            "habitudes_out_sorted": habitudes_out_sorted,
+            "habitudes_in_sorted": habitudes_in_sorted,
+            "unusual_list": unusual_list,
+            "timeouts": timeouts,
+            "excluded_count": excluded_count,
+            "prefix_freq": prefix_freq,
+            "prefix_freq_v6": prefix_freq_v6,
+            "suspect_hits": suspect_hits,
+            "suspect_hits_by_window": suspect_hits_by_window,
+            "suspect_windows_str": suspect_txt,
+            "main_country": main_country,
+            "weights": weights,
+            "ip_totals": ip_totals,
+            "exclusions_list": exclusions,
+            "ipv6_count": local_ipv6_count,
+            "total_rows": total_rows,
+        }
+
+def run_analysis(cfg, progress=None, stop=None):
+    # Point d'entrée programmatique : même dictionnaire de résultats que l'interface
+    return Analysis(cfg, progress, stop).run()
+
+# =========================
+# EXPORTS
+# =========================
+def export_pdf(*args, **kwargs):
+    # reportlab et matplotlib ne sont importés qu'au premier export PDF
+    from ipanalyse_pdf import export_pdf as build_pdf
+    return build_pdf(*args, **kwargs)
+
+def report_exports(data, out_dir, html=True, pdf=False, open_browser=True):
+    # Exports demandés pour un résultat de run_analysis : [(format, fonction, arguments)]
+    results = data["results"]
+    common = dict(
+        results=results, exclusions=data["exclusions_list"], timeouts=data["timeouts"], suspects=data["suspects"],
+        country_counts=data["country_counts"],
+        habitudes_out_sorted=data["habitudes_out_sorted"],
+        habitudes_in_sorted=data["habitudes_in_sorted"],
+        unusual_list=data["unusual_list"],
+        prefix_freq=data["prefix_freq"],
+        suspect_hits=data["suspect_hits"], suspect_windows_str=data["suspect_windows_str"],
+        base_dir=out_dir, main_country=data["main_country"],
+        total_rows=data.get("total_rows", len(results)), excluded_count=data["excluded_count"],
+        prefix_freq_v6=data.get("prefix_freq_v6"), suspect_hits_by_window=data.get("suspect_hits_by_window"),
+        ipv6_count=data.get("ipv6_count", 0))
+    exports = []
+    if html:
+        exports.append(("HTML", export_html, dict(common, prefix="Rapport_complet", open_browser=open_browser)))
+    if pdf:
+        exports.append(("PDF", export_pdf, common))
+    return exports
+
+# =========================
+# LIGNE DE COMMANDE
+# =========================
+def parse_weight(text):
+    name, sep, value = text.partition("=")
+    if not sep or name.strip() not in DEFAULT_WEIGHTS:
+        raise argparse.ArgumentTypeError(f"attendu NOM=VALEUR, NOM parmi : {', '.join(DEFAULT_WEIGHTS)}")
+    try:
+        return name.strip(), int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"poids entier attendu : {text}")
+
+def build_parser():
+    p = argparse.ArgumentParser(
+        prog="ipanalyse_core.py",
+        description="Analyse d'un CSV de connexions IP sans interface graphique (cron, scripts). "
+                    "Les valeurs par défaut viennent de config.json.")
+    p.add_argument("csv_path", help="CSV à analyser (Date,IP ; .gz/.bz2/.xz/.zst acceptés)")
+    p.add_argument("--ip2proxy", default=CONFIG.get("ip2proxy", ""), help="base IP2Proxy Lite (CSV ou .BIN)")
+    p.add_argument("--api-key", default=CONFIG.get("api_key", ""), help="clé ipdata / IPQualityScore")
+    p.add_argument("--exclusions", default="", help="plages IP exclues, ex. \"92.* , 10.0.0.0/8\"")
+    p.add_argument("--unusual", default=CONFIG.get("unusual_ranges", ""), help="plages horaires inhabituelles, ex. \"22:00-06:00\"")
+    p.add_argument("--windows", default=CONFIG.get("suspect_datetime_windows", ""),
+                   help="fenêtres suspectes, ex. \"15/11/2024 22:00-23:00\"")
+    p.add_argument("--country", default=CONFIG.get("main_country", "France"), help="pays principal")
+    p.add_argument("--weight", action="append", type=parse_weight, default=[], metavar="NOM=VALEUR",
+                   help="poids de scoring (répétable), ex. off_country=40")
+    p.add_argument("--exclude-others", action=argparse.BooleanOptionalAction,
+                   default=CONFIG.get("exclude_other_countries", False), help="ignorer les IP d'autres pays hors fenêtres")
+    p.add_argument("--workers", type=int, default=CONFIG.get("lookup_workers", DEFAULT_LOOKUP_WORKERS),
+                   help="requêtes de lookup simultanées")
+    p.add_argument("--cache", action=argparse.BooleanOptionalAction, default=CONFIG.get("disk_cache", True),
+                   help="cache disque des lookups")
+    p.add_argument("--html", action=argparse.BooleanOptionalAction, default=CONFIG.get("export_html", True),
+                   help="rapport HTML")
+    p.add_argument("--pdf", action=argparse.BooleanOptionalAction, default=CONFIG.get("export_pdf", False),
+                   help="rapport PDF")
+    p.add_argument("--out", default=CONFIG.get("output_dir", "."), help="dossier de sortie des rapports")
+    p.add_argument("--open", action="store_true", help="ouvrir le rapport HTML dans le navigateur")
+    p.add_argument("--verbose-log", action="store_true", help=f"journal ligne à ligne ({VERBOSE_LOG_FILE}) dans le dossier de sortie")
+    p.add_argument("-q", "--quiet", action="store_true", help="n'afficher que les erreurs")
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    weights = dict(DEFAULT_WEIGHTS, **CONFIG.get("weights", {}))
+    weights.update(args.weight)
+    cfg = {
+        "csv_path": args.csv_path,
+        "api_key": args.api_key.strip() or None,
+        "ip2p_path": args.ip2proxy.strip(),
+        "raw_exclusions": args.exclusions.strip(),
+        "unusual_ranges": args.unusual.strip(),
+        "suspect_windows": args.windows.strip(),
+        "main_country": args.country.strip() or "France",
+        "weights": weights,
+        "exclude_others": args.exclude_others,
+        "lookup_workers": args.workers,
+        "disk_cache": args.cache,
+        "http_pool_size": CONFIG.get("http_pool_size"),
+        "http_timeout": CONFIG.get("http_timeout", DEFAULT_HTTP_TIMEOUT),
+        "lookup_retries": CONFIG.get("lookup_retries", LOOKUP_RETRIES),
+        "cache_path": CONFIG.get("cache_path", CACHE_FILE),
+        "cache_ttl_days": CONFIG.get("cache_ttl_days", DEFAULT_CACHE_TTL_DAYS),
+        "cache_negative_ttl_min": CONFIG.get("cache_negative_ttl_min", DEFAULT_CACHE_NEGATIVE_TTL_MIN),
+        "cache_max_entries": CONFIG.get("cache_max_entries", DEFAULT_CACHE_MAX_ENTRIES),
+        "ipv6_prefix_len": CONFIG.get("ipv6_prefix_len", IPV6_PREFIX_LEN),
+        "isp_catalogue": CONFIG.get("isp_catalogue"),
+    }
+    if args.verbose_log:
+        os.makedirs(args.out, exist_ok=True)
+        cfg["verbose_log"] = os.path.join(args.out, VERBOSE_LOG_FILE)
+
+    def log(msg):
+        if not args.quiet: print(msg, file=sys.stderr, flush=True)
+
+    # Ctrl-C lève le drapeau d'arrêt : l'analyse s'interrompt d'elle-même, sans
+    # attendre la fin des lookups en file comme le ferait un KeyboardInterrupt.
+    # Un second Ctrl-C interrompt immédiatement. Hors du fil principal (main() appelé
+    # depuis un autre programme), les signaux ne peuvent pas être interceptés.
+    stop = threading.Event()
+    def on_sigint(signum, frame):
+        if stop.is_set(): raise KeyboardInterrupt
+        stop.set()
+        log("Interruption demandée…")
+    previous = None
+    if threading.current_thread() is threading.main_thread():
+        previous = signal.signal(signal.SIGINT, on_sigint)
+    try:
+        data = run_analysis(cfg, progress=lambda cur, total, msg: log(msg), stop=stop)
+    except KeyboardInterrupt:
+        data = {"cancelled": True}
+    except Exception as e:
+        print(f"Erreur pendant l'analyse : {e}", file=sys.stderr)
+        return 1
+    finally:
+        if previous is not None: signal.signal(signal.SIGINT, previous)
+    if data.get("cancelled"):
+        print("Analyse annulée.", file=sys.stderr)
+        return 130
+
+    log(f"{len(data['results'])} connexion(s) analysée(s), {len(data['suspects'])} IP suspecte(s)")
+    status = 0
+    for kind, export, kwargs in report_exports(data, args.out, html=args.html, pdf=args.pdf, open_browser=args.open):
+        try:
+            path = export(progress=log, **kwargs)
+        except Exception as e:
+            print(f"Erreur pendant l'export {kind} : {e}", file=sys.stderr)
+            status = 1
+            continue
+        print(path)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Rapport PDF d'IPanalyse (reportlab + matplotlib), chargé à la demande par
+# ipanalyse_core.export_pdf : le cœur d'analyse reste importable sans ces dépendances.
+
+import io, os, itertools
+from datetime import datetime
+
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle, Flowable
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+
+from ipanalyse_core import COUNTRY_COORDS, HABIT_SLOTS, REPORT_PROGRESS_PAGES
+
+
+def generate_country_map(country_counts, filepath=None):
+    if filepath is None:
+        filepath = f"map_{datetime.now().strftime('%d%m%H%M%S')}.png"
+    # Figure sans pyplot : pas d'état global, utilisable depuis un thread d'export
+    fig = Figure(figsize=(8,5))
+    ax = fig.subplots()
+    ax.set_title("Carte des connexions IP par pays")
+    ax.set_xlim(-180, 180); ax.set_ylim(-90, 90)
+    ax.set_xlabel("Longitude"); ax.set_ylabel("Latitude")
+    ax.grid(True, linestyle="--", alpha=0.5)
+    for country,count in country_counts.items():
+        coord=COUNTRY_COORDS.get(country)
+        if coord:
+            lat, lon = coord
+            ax.scatter(lon, lat, s=50+count*5, alpha=0.7)
+            ax.text(lon+2, lat+2, f"{country} ({count})", fontsize=8)
+    fig.savefig(filepath, format="png", bbox_inches="tight")
+    return filepath
+
+PDF_TABLE_CHUNK = 500   # lignes par Table reportlab (tableaux PDF construits au fil de la mise en page)
+PDF_TABLE_STYLE = [
+    ("BACKGROUND",(0,0),(-1,0), colors.lightgrey),
+    ("GRID",(0,0),(-1,-1),0.25, colors.grey),
+    ("FONTSIZE",(0,0),(-1,-1),8),
+]
+
+class TableStream(Flowable):
+    # Tableau PDF de longueur quelconque : les lignes sont lues par paquets de PDF_TABLE_CHUNK
+    # au moment où la mise en page les atteint ; chaque paquet devient une Table (entête
+    # répété, coupée à la page) suivie du reste du flux. Seul le paquet courant est en mémoire.
+    def __init__(self, header, rows, col_widths, style=(), chunk=PDF_TABLE_CHUNK):
+        super().__init__()
+        self.header, self.col_widths, self.chunk = header, col_widths, chunk
+        self.style = TableStyle(PDF_TABLE_STYLE + list(style))
+        self.rows = iter(rows)
+        self._pending = None
+
+    def _next_chunk(self):
+        if self._pending is None:
+            self._pending = list(itertools.islice(self.rows, self.chunk))
+        return self._pending
+
+    def wrap(self, availWidth, availHeight):
+        # hauteur « infinie » tant qu'il reste des lignes : le cadre appelle alors split()
+        return (availWidth, 0) if not self._next_chunk() else (availWidth, availHeight + 1)
+
+    def split(self, availWidth, availHeight):
+        data = self._next_chunk()
+        if not data:
+            return []
+        table = Table([self.header] + data, repeatRows=1, colWidths=self.col_widths)
+        table.setStyle(self.style)
+        parts = table.split(availWidth, availHeight)   # [] : pas la place, page suivante
+        if not parts:
+            return []
+        rest = TableStream(self.header, self.rows, self.col_widths, chunk=self.chunk)
+        rest.style = self.style
+        return parts + [rest]
+
+    def draw(self):
+        pass
+
+def export_pdf(results, suspects, country_counts, main_country="France",
+               total_rows=0, excluded_count=0, timeouts=None, unusual_list=None, exclusions=None,
+               habitudes_out_sorted=None, habitudes_in_sorted=None, prefix_freq=None, suspect_hits=None, suspect_windows_str="",
+               base_dir=".", prefix_freq_v6=None, suspect_hits_by_window=None, ipv6_count=0, progress=None):
+    # results : ResultStore ; unusual_list, suspect_hits et habitudes : indices de lignes
+    # progress(message) : appelé pendant la mise en page (facultatif)
+    if timeouts is None: timeouts = []
+    if unusual_list is None: unusual_list = []
+    if exclusions is None: exclusions = []
+    if habitudes_out_sorted is None: habitudes_out_sorted = []
+    if habitudes_in_sorted  is None: habitudes_in_sorted  = []
+    if prefix_freq is None: prefix_freq = []
+    if suspect_hits is None: suspect_hits = []
+
+    os.makedirs(base_dir, exist_ok=True)
+    filename = os.path.join(base_dir, f"Rapport_IP_{datetime.now().strftime('%d%m')}.pdf")
+    doc = SimpleDocTemplate(filename, pagesize=A4, pageCompression=1, leftMargin=36, rightMargin=36, topMargin=36, bottomMargin=36)
+    styles = getSampleStyleSheet()
+    story = []
+
+    story.append(Paragraph("📊 Rapport d'analyse IP", styles["Title"]))
+    story.append(Spacer(1, 12))
+    story.append(Paragraph(f"Date : {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", styles["Normal"]))
+    story.append(Spacer(1, 12))
+
+    story.append(Paragraph("<b>Résumé rapide :</b>", styles["Heading2"]))
+    story.append(Paragraph(f"Total lignes CSV : {total_rows}", styles["Normal"]))
+    story.append(Paragraph(f"Connexions analysées : {len(results)}", styles["Normal"]))
+    story.append(Paragraph(f"Connexions IPv6 : {ipv6_count}", styles["Normal"]))
+    story.append(Paragraph(f"Pays détectés : {len(country_counts)}", styles["Normal"]))
+    story.append(Paragraph(f"IP suspectes : {len(suspects)}", styles["Normal"]))
+    story.append(Paragraph(f"IP exclues : {excluded_count}", styles["Normal"]))
+    story.append(Paragraph(f"Pays principal : {main_country}", styles["Normal"]))
+    story.append(Spacer(1, 20))
+
+    # carte rendue une seule fois en mémoire (pas de PNG temporaire)
+    map_png = io.BytesIO()
+    generate_country_map(country_counts, filepath=map_png)
+    map_png.seek(0)
+    story.append(Paragraph("🗺️ Carte des pays détectés :", styles["Heading2"]))
+    story.append(RLImage(map_png, width=400, height=250))
+    story.append(Spacer(1, 20))
+
+    # Suspects (avec ISP)
+    story.append(Paragraph("🚨 IP suspectes :", styles["Heading2"]))
+    if suspects:
+        story.append(TableStream(
+            ["IP", "Score", "Nb", "Pays", "ISP", "Raisons"],
+            ([s['ip'], str(s['score']), str(s['count']), s['country'], s.get('isp','N/A'),
+              Paragraph("; ".join(s['reasons']), styles["BodyText"])] for s in suspects),
+            [95,40,35,75,90,188], style=[("ALIGN",(1,1),(2,-1),"CENTER"), ("VALIGN",(0,0),(-1,-1),"MIDDLE")]))
+    else:
+        story.append(Paragraph("Aucun suspect détecté.", styles["Normal"]))
+    story.append(Spacer(1, 18))
+
+    # Fenêtres suspectes (avec opérateur)
+    story.append(Paragraph("🕵️ Connexions dans les fenêtres suspectes", styles["Heading2"]))
+    if not suspect_windows_str.strip():
+        story.append(Paragraph("Aucune fenêtre définie.", styles["Normal"]))
+    else:
+        story.append(Paragraph(f"<b>Fenêtres :</b> {suspect_windows_str}", styles["Normal"]))
+        if suspect_hits_by_window:
+            story.append(TableStream(
+                ["Fenêtre", "Connexions", "IP distinctes"],
+                ([label, str(len(hits)), str(len({results.ip_ids[i] for i in hits}))]
+                 for label, hits in suspect_hits_by_window),
+                [200, 80, 80], style=[("ALIGN",(1,1),(-1,-1),"CENTER")]))
+            story.append(Spacer(1, 8))
+        if suspect_hits:
+            story.append(TableStream(
+                ["Horodatage", "IP", "Pays", "VPN", "Opérateur", "Occ. IP"],
+                ([*results.row(i), str(results.ip_total(i))] for i in suspect_hits),
+                [100,95,80,80,113,55], style=[("ALIGN",(5,1),(5,-1),"CENTER")]))
+        else:
+            story.append(Paragraph("Aucune connexion dans ces fenêtres.", styles["Normal"]))
+    story.append(Spacer(1, 18))
+
+    # /24 fréquents
+    story.append(Paragraph("📌 Plage d'adresses IPs revenant le plus fréquemment :", styles["Heading2"]))
+    if prefix_freq:
+        story.append(TableStream(["Plage /24", "Occurrences"], ([p, str(c)] for p, c in prefix_freq),
+                                 [200, 100], style=[("ALIGN",(1,1),(1,-1),"CENTER")]))
+    else:
+        story.append(Paragraph("Aucune plage /24 récurrente trouvée.", styles["Normal"]))
+    if prefix_freq_v6:
+        story.append(Spacer(1, 8))
+        story.append(TableStream(["Plage IPv6", "Occurrences"], ([p, str(c)] for p, c in prefix_freq_v6),
+                                 [260, 100], style=[("ALIGN",(1,1),(1,-1),"CENTER")]))
+    story.append(Spacer(1, 20))
+
+    # Exclusions / Timeouts
+    story.append(Paragraph("📍 IP exclues :", styles["Heading2"]))
+    if exclusions:
+        for e in exclusions:
+            story.append(Paragraph(f"- {e}", styles["Normal"]))
+    else:
+        story.append(Paragraph("Aucune", styles["Normal"]))
+    story.append(Spacer(1, 20))
+
+    story.append(Paragraph("⚠️ IP 'timed out' :", styles["Heading2"]))
+    if timeouts:
+        story.append(TableStream(["Horodatage", "IP"], ([tmo[0], tmo[1]] for tmo in timeouts), [120, 300]))
+    else:
+        story.append(Paragraph("Aucune", styles["Normal"]))
+    story.append(Spacer(1, 20))
+
+    # Inhabituelles (table + ISP)
+    story.append(Paragraph("🌙 Connexions horaires inhabituelles :", styles["Heading2"]))
+    if unusual_list:
+        story.append(TableStream(
+            ["Horodatage", "IP", "Pays", "ISP"],
+            ([date_u, ip_u, pays_u, oper_u] for date_u, ip_u, pays_u, _, oper_u in results.rows(unusual_list)),
+            [110,110,90,213]))
+    else:
+        story.append(Paragraph("Aucune connexion inhabituelle détectée.", styles["Normal"]))
+    story.append(Spacer(1, 20))
+
+    # Habitudes : récapitulatif par tranche puis détail de chaque côté
+    story.append(Paragraph(f"🕰️ Habitudes de connexions hors {main_country} / {main_country} (tranches 30 min) :", styles["Heading2"]))
+    if not (habitudes_out_sorted or habitudes_in_sorted):
+        story.append(Paragraph("Aucune donnée disponible", styles["Normal"]))
+    else:
+        out_counts = {tranche: len(connexions) for tranche, connexions in habitudes_out_sorted}
+        in_counts = {tranche: len(connexions) for tranche, connexions in habitudes_in_sorted}
+        story.append(TableStream(
+            ["Tranche", f"Hors {main_country}", main_country],
+            ([tranche, str(out_counts.get(tranche, 0)), str(in_counts.get(tranche, 0))]
+             for tranche in HABIT_SLOTS if tranche in out_counts or tranche in in_counts),
+            [120, 100, 100], style=[("ALIGN",(1,1),(-1,-1),"CENTER")]))
+        for title, habitudes in ((f"Hors {main_country}", habitudes_out_sorted), (main_country, habitudes_in_sorted)):
+            story.append(Spacer(1, 10))
+            story.append(Paragraph(f"<b>{title}</b>", styles["Normal"]))
+            if habitudes:
+                story.append(TableStream(
+                    ["Tranche", "Horodatage", "IP", "Pays"],
+                    ([tranche, c[0], c[1], c[2]] for tranche, connexions in habitudes for c in results.rows(connexions)),
+                    [100,130,140,153]))
+            else:
+                story.append(Paragraph("Aucune donnée", styles["Normal"]))
+    story.append(Spacer(1, 20))
+
+    # Tableau complet (avec opérateur)
+    story.append(Paragraph("📋 Tableau complet", styles["Heading2"]))
+    story.append(TableStream(["Date", "IP", "Pays", "VPN", "Opérateur"], (list(r) for r in results.rows()),
+                             [110,110,90,90,123]))
+
+    def on_page(canvas, doc):
+        page = canvas.getPageNumber()
+        if progress is not None and page % REPORT_PROGRESS_PAGES == 0:
+            progress(f"PDF : {page} pages mises en page…")
+    doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    return filename
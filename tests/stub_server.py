@@ -0,0 +1,88 @@
+# Faux fournisseur HTTP local pour les tests des lookups (aucun accès réseau).
+import json, os, sys, threading, unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ipanalyse_core as core
+
+
+class StubProvider:
+    # respond(method, path, body) -> (status, en-têtes, objet JSON) ; requêtes reçues dans self.requests
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, method):
+                n = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(n)) if n else None
+                stub.requests.append((method, self.path, body))
+                status, headers, obj = stub.respond(method, self.path, body)
+                data = json.dumps(obj).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in headers.items():
+                    self.send_header(k, str(v))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply("GET")
+
+            def do_POST(self):
+                self._reply("POST")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def services(self):
+        # Copie de core.SERVICES dont toutes les URL pointent vers ce serveur
+        def local(spec):
+            spec = dict(spec)
+            path = spec["url"].split("/", 3)[3]
+            spec["url"] = f"{self.url}/{path}"
+            if "batch" in spec: spec["batch"] = local(spec["batch"])
+            return spec
+        return {name: local(spec) for name, spec in core.SERVICES.items()}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def reset_core_state():
+    # Réserves HTTP, quotas et lots refusés repartent de zéro ; pas de proxy système
+    core.configure_http()
+    core.HTTP_SETTINGS["proxies"] = {}
+    core.RATE_LIMITERS.clear()
+    core.BATCH_REFUSED.clear()
+
+
+def ip_api_item(ip, country="FR", isp="Orange", hosting=False):
+    # Réponse ip-api réussie pour une IP (élément de /batch ou réponse unitaire)
+    return {"status": "success", "countryCode": country, "hosting": hosting, "isp": isp, "query": ip}
+
+
+def single_ip(path):
+    # IP d'une URL de lookup unitaire (/json/<ip>?…)
+    return path.split("?")[0].rsplit("/", 1)[1]
+
+
+class StubServerTestCase(unittest.TestCase):
+    # start(respond) : core.SERVICES redirigé vers un StubProvider, état réinitialisé
+    # avant et après le test ; le serveur est accessible par self.stub
+    def start(self, respond):
+        self.stub = StubProvider(respond)
+        self.addCleanup(self.stub.close)
+        patcher = mock.patch.object(core, "SERVICES", self.stub.services())
+        patcher.start(); self.addCleanup(patcher.stop)
+        reset_core_state(); self.addCleanup(reset_core_state)
@@ -0,0 +1,77 @@
+import os, tempfile, unittest
+
+from stub_server import StubServerTestCase, ip_api_item, single_ip, core
+
+IPDATA_KEY = "ipd_test"
+
+
+class BatchLookupTests(StubServerTestCase):
+    def test_ip_api_batch_maps_by_query_not_position(self):
+        def respond(method, path, body):
+            # réponse dans le désordre, une IP absente
+            return 200, {}, [ip_api_item(ip, hosting=ip.endswith(".9")) for ip in reversed(body) if ip != "5.5.5.5"]
+        self.start(respond)
+        found = core.fetch_ip_info_batch(["1.1.1.1", "2.2.2.9", "5.5.5.5"])
+        self.assertEqual(found["1.1.1.1"], ("France", "Non", "Orange"))
+        self.assertEqual(found["2.2.2.9"], ("France", "Oui (Hosting)", "Orange"))
+        self.assertEqual(found["5.5.5.5"], core.TIMED_OUT)
+        self.assertEqual([m for m, _, _ in self.stub.requests], ["POST"])
+
+    def test_ipdata_bulk_object_indexed_by_ip(self):
+        def respond(method, path, body):
+            return 200, {}, {ip: {"ip": ip, "country_code": "DE", "asn": {"name": "DTAG"}} for ip in body}
+        self.start(respond)
+        found = core.fetch_ip_info_batch(["3.3.3.3", "4.4.4.4"], IPDATA_KEY)
+        self.assertEqual(found, {ip: ("Allemagne", "Non", "DTAG") for ip in ["3.3.3.3", "4.4.4.4"]})
+
+    def test_refused_batch_falls_back_to_single_lookups(self):
+        def respond(method, path, body):
+            if method == "POST":
+                return 403, {}, {"message": "bulk not allowed"}
+            return 200, {}, {"ip": single_ip(path), "country_code": "NL", "company": {"name": "KPN"}}
+        self.start(respond)
+        ips = ["6.6.6.1", "6.6.6.2", "6.6.6.3"]
+        cache = core.resolve_ips({ip: "2024-11-15 22:00:00" for ip in ips}, IPDATA_KEY, retries=0)
+        self.assertEqual(cache, {ip: ("Pays-Bas", "Non", "KPN") for ip in ips})
+        # lot refusé une seule fois, puis plus de POST pour ce fournisseur
+        cache = core.resolve_ips({"6.6.6.4": "2024-11-15 22:00:00"}, IPDATA_KEY, retries=0)
+        self.assertEqual(cache["6.6.6.4"], ("Pays-Bas", "Non", "KPN"))
+        self.assertEqual([m for m, _, _ in self.stub.requests].count("POST"), 1)
+
+    def test_rate_limited_bulk_is_retried_not_refused(self):
+        def respond(method, path, body):
+            if len(self.stub.requests) == 1:
+                return 429, {}, {"message": "too many requests"}
+            return 200, {}, [{"ip": ip, "country_code": "BE", "asn": {"name": "Proximus"}} for ip in body]
+        self.start(respond)
+        ips = ["8.8.4.1", "8.8.4.2"]
+        cache = core.resolve_ips({ip: "2024-11-15 22:00:00" for ip in ips}, IPDATA_KEY, retries=1, backoff=0.01)
+        self.assertEqual(cache, {ip: ("Belgique", "Non", "Proximus") for ip in ips})
+        self.assertNotIn("ipdata", core.BATCH_REFUSED)
+        self.assertEqual([m for m, _, _ in self.stub.requests], ["POST", "POST"])
+
+    def test_excluded_ips_in_a_window_join_the_batch(self):
+        self.start(lambda method, path, body: (200, {}, [ip_api_item(ip) for ip in body]))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "connexions.csv")
+            with open(path, "w") as f:
+                for i in range(5):
+                    f.write(f"2024-11-15 22:30:00,92.1.1.{i}\n2024-11-15 10:00:00,92.1.1.{i}\n")
+                f.write("2024-11-15 10:00:00,8.8.8.8\n2024-11-15 10:00:00,92.1.2.1\n")
+            data = core.run_analysis({"csv_path": path, "raw_exclusions": "92.*", "disk_cache": False,
+                                      "suspect_windows": "15/11/2024 22:00-23:00"})
+        self.assertEqual(len(data["suspect_hits"]), 5)
+        self.assertEqual(data["excluded_count"], 6)
+        # une seule requête de lot, sans l'IP exclue jamais vue dans une fenêtre
+        self.assertEqual([(m, len(body)) for m, _, body in self.stub.requests], [("POST", 6)])
+        self.assertNotIn("92.1.2.1", self.stub.requests[0][2])
+
+    def test_server_error_keeps_chunk_timed_out(self):
+        self.start(lambda method, path, body: (503, {}, {}))
+        found = core.fetch_ip_info_batch(["7.7.7.7"], IPDATA_KEY)
+        self.assertEqual(found, {"7.7.7.7": core.TIMED_OUT})
+        self.assertNotIn("ipdata", core.BATCH_REFUSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
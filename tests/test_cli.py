@@ -0,0 +1,28 @@
+import os, signal, tempfile, threading, unittest
+
+from stub_server import core
+
+
+class CliTests(unittest.TestCase):
+    def run_main(self, tmp):
+        path = os.path.join(tmp, "connexions.csv")
+        with open(path, "w") as f:
+            f.write("Date,IP\n2024-11-15 22:30:00,10.0.0.1\n2024-11-15 22:31:00,192.168.1.5\n")
+        return core.main([path, "--no-cache", "--no-html", "--no-pdf", "--out", tmp, "-q"])
+
+    def test_runs_outside_the_main_thread(self):
+        codes = []
+        with tempfile.TemporaryDirectory() as tmp:
+            t = threading.Thread(target=lambda: codes.append(self.run_main(tmp)))
+            t.start(); t.join(30)
+        self.assertEqual(codes, [0])
+
+    def test_sigint_handler_is_restored(self):
+        before = signal.getsignal(signal.SIGINT)
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(self.run_main(tmp), 0)
+        self.assertIs(signal.getsignal(signal.SIGINT), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os, tempfile, unittest
+from unittest import mock
+
+from stub_server import core
+
+
+class CsvPassTests(unittest.TestCase):
+    def write(self, text):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "connexions.csv")
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_small_file_keeps_its_last_row_in_the_sample(self):
+        source = core.CsvSource(self.write("2024-11-15 22:30:00;10.0.0.1\n"))
+        self.assertEqual(source.sample_rows, [["2024-11-15 22:30:00", "10.0.0.1"]])
+        self.assertEqual(source.date_parser().fmt, "%Y-%m-%d %H:%M:%S")
+
+    def test_cut_sample_drops_the_partial_row(self):
+        source = core.CsvSource(self.write("2024-11-15 22:30:00;10.0.0.1\n" * 10), sample_size=75)
+        self.assertEqual(len(source.sample_rows), 2)   # la 3e ligne, coupée à 17 caractères, est écartée
+
+    def test_each_timestamp_is_parsed_once(self):
+        lines = ["2024-11-15 22:30:00,10.1.0.1", "2024-11-15 10:00:00,10.1.0.1",
+                 "2024-11-15 10:00:00,10.1.0.2", "2024-11-15 22:40:00,192.168.0.1", "bad,row"]
+        path = self.write("\n".join(lines) + "\n")
+        calls = []
+        parse = core.DateParser.__call__
+        def counting(parser, date_str):
+            calls.append(date_str)
+            return parse(parser, date_str)
+        with mock.patch.object(core.DateParser, "__call__", counting):
+            data = core.run_analysis({"csv_path": path, "raw_exclusions": "10.1.*", "disk_cache": False,
+                                      "suspect_windows": "15/11/2024 22:00-23:00"})
+        self.assertEqual(sorted(calls), sorted(l.split(",")[0] for l in lines[:4]))
+        self.assertEqual(data["excluded_count"], 2)
+        self.assertEqual(len(data["suspect_hits"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from stub_server import core
+
+
+def exclusion_set(text):
+    return core.ExclusionSet(core.split_exclusions(text))
+
+
+class ExclusionTests(unittest.TestCase):
+    def test_slash_between_patterns_separates_them(self):
+        excl = exclusion_set("92.*/90.* ; 10.0.0.0/8")
+        self.assertEqual(excl.patterns, ["92.*", "90.*", "10.0.0.0/8"])
+        for ip in ("92.1.2.3", "90.4.5.6", "10.200.0.1"):
+            self.assertTrue(excl.contains(ip), ip)
+        self.assertFalse(excl.contains("91.0.0.1"))
+
+    def test_slash_after_a_cidr_separates_patterns(self):
+        for text, first in (("10.0.0.0/8/90.*", "10.0.0.0/8"), ("192.168.1.0/24/10.*", "192.168.1.0/24"),
+                            ("2a01:cb00::/32/92.*", "2a01:cb00::/32")):
+            excl = exclusion_set(text)
+            self.assertEqual(excl.patterns, [first, text.rsplit("/", 1)[1]], text)
+            self.assertEqual(excl.invalid, [])
+            self.assertFalse(excl.contains("8.8.8.8"), text)
+        self.assertTrue(exclusion_set("10.0.0.0/8/90.*").contains("10.200.0.1"))
+
+    def test_pipe_separates_patterns(self):
+        excl = exclusion_set("92.*|90.*")
+        self.assertEqual(excl.patterns, ["92.*", "90.*"])
+        self.assertTrue(excl.contains("90.4.5.6"))
+
+    def test_bare_number_is_not_a_pattern(self):
+        excl = exclusion_set("8 , 24")
+        self.assertEqual(excl.invalid, ["8", "24"])
+        self.assertFalse(excl.contains("8.8.8.8"))
+
+    def test_unreadable_tokens_are_reported_not_applied(self):
+        excl = exclusion_set("92.* et 90.*, 300.*, 2a01:zz::/32")
+        self.assertEqual(excl.patterns, ["92.*", "90.*"])
+        self.assertEqual(excl.invalid, ["et", "300.*", "2a01:zz::/32"])
+
+    def test_ipv6_network(self):
+        excl = exclusion_set("2a01:cb00::/32")
+        self.assertTrue(excl.contains("2a01:cb00:1::1"))
+        self.assertFalse(excl.contains("2a01:cb01::1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os, random, struct, tempfile, unittest
+from unittest import mock
+
+from stub_server import core
+
+
+@unittest.skipIf(core.np is None, "NumPy absent")
+class LocalBulkTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "IP2PROXY-LITE-PX2.CSV")
+        with open(path, "w", encoding="utf-8") as f:
+            # plages IPv4 dans le désordre, dont une dans un bloc privé
+            f.write('"1500000000","1500000255","VPN","DE","Germany"\n')
+            f.write('"16777216","16777471","PUB","US","United States"\n')
+            f.write('"167772160","167772415","TOR","-","-"\n')
+            f.write('"3000000000","3000065535","DCH","FR","France"\n')
+        patcher = mock.patch.object(core, "IP2P_INDEX", core.Ip2ProxyIndex.from_csv(path))
+        patcher.start(); self.addCleanup(patcher.stop)
+
+    def test_matches_per_ip_classification(self):
+        rnd = random.Random(13)
+        ints = [1500000000, 1500000255, 1500000256, 16777216, 16777215, 167772200, 3000000000,
+                3000065535, 3000065536, 0, 0xFFFFFFFF, 0xC0A80101, 0x64400001, 0x08080808]
+        ints += [rnd.getrandbits(32) for _ in range(500)]
+        ints += [rnd.randrange(3000000000, 3000065536) for _ in range(50)]
+        v4 = [str(core.ipaddress.IPv4Address(n)) for n in ints]
+        expected = {ip: info for ip in v4 if (info := core.local_ip_info(ip))}
+        self.assertGreater(len(expected), 60)
+        self.assertEqual(core.local_ip_info_bulk(v4, ints), expected)
+
+
+def write_bin(path, dbtype, rows, dbcolumn=3):
+    # Base .BIN IPv4 minimale : rows = [(ip_from, type, pays)], suivie d'une ligne de fin
+    strings, blob = {}, bytearray()
+    header_size, width = 64, dbcolumn * 4
+    base = header_size + 1
+    data_end = header_size + width * (len(rows) + 1)
+    def ptr(text):
+        if text not in strings:
+            strings[text] = data_end + len(blob)
+            blob.extend(bytes([len(text)]) + text.encode())
+        return strings[text]
+    table = bytearray()
+    for ip_from, ptype, country in rows + [(0xFFFFFFFF, "-", "-")]:
+        cols = [ip_from, ptr(ptype), ptr(country)] + [0] * (dbcolumn - 3)
+        table.extend(struct.pack(f"<{dbcolumn}I", *cols))
+    header = struct.pack("<5B6IB", dbtype, dbcolumn, 24, 1, 1, len(rows), base, 0, 0, 0, 0, 2)
+    with open(path, "wb") as f:
+        f.write(header.ljust(header_size, b"\0") + table + blob)
+
+
+class Ip2ProxyBinTests(unittest.TestCase):
+    def test_px12_database_is_read(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "IP2PROXY-LITE-PX12.BIN")
+            write_bin(path, 12, [(0, "-", "-"), (16777216, "VPN", "DE"), (16777472, "-", "-")])
+            db = core.Ip2ProxyBin(path)
+            try:
+                self.assertEqual(db.lookup(16777300), ("VPN", "DE"))
+                self.assertEqual(db.lookup(16777472), (None, None))
+            finally:
+                db._mm.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
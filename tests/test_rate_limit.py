@@ -0,0 +1,72 @@
+import threading, time, unittest
+
+from stub_server import StubServerTestCase, ip_api_item, single_ip, core
+
+
+class RateLimitTests(StubServerTestCase):
+    def test_exhausted_quota_waits_for_x_ttl(self):
+        # X-Rl 0 : la requête suivante attend la remise à zéro annoncée par X-Ttl
+        self.start(lambda method, path, body: (200, {"X-Rl": 0, "X-Ttl": 1}, ip_api_item(single_ip(path))))
+        t0 = time.monotonic()
+        self.assertEqual(core.fetch_ip_info("1.1.1.1")[0], "France")
+        first = time.monotonic() - t0
+        self.assertEqual(core.fetch_ip_info("1.1.1.2")[0], "France")
+        self.assertLess(first, 0.5)
+        self.assertGreaterEqual(time.monotonic() - t0, 0.9)
+
+    def test_remaining_quota_does_not_wait(self):
+        self.start(lambda method, path, body: (200, {"X-Rl": 40, "X-Ttl": 60}, ip_api_item(single_ip(path))))
+        t0 = time.monotonic()
+        for i in range(5):
+            core.fetch_ip_info(f"2.2.2.{i}")
+        self.assertLess(time.monotonic() - t0, 0.5)
+
+    def test_429_is_retried_after_the_window(self):
+        calls = []
+        def respond(method, path, body):
+            calls.append(path)
+            if len(calls) == 1:
+                return 429, {"X-Rl": 0, "X-Ttl": 1}, {"status": "fail"}
+            return 200, {"X-Rl": 44, "X-Ttl": 60}, ip_api_item(single_ip(path))
+        self.start(respond)
+        t0 = time.monotonic()
+        self.assertEqual(core.fetch_ip_info("3.3.3.3"), ("France", "Non", "Orange"))
+        self.assertEqual(len(calls), 2)
+        self.assertGreaterEqual(time.monotonic() - t0, 0.9)
+
+    def test_batch_endpoint_has_its_own_quota(self):
+        # quota du /batch épuisé : les requêtes IP à IP ne sont pas freinées
+        def respond(method, path, body):
+            if method == "POST":
+                return 200, {"X-Rl": 0, "X-Ttl": 30}, [ip_api_item(ip) for ip in body]
+            return 200, {"X-Rl": 40, "X-Ttl": 60}, ip_api_item(single_ip(path))
+        self.start(respond)
+        core.fetch_ip_info_batch(["4.4.4.4"])
+        t0 = time.monotonic()
+        core.fetch_ip_info("4.4.4.5")
+        self.assertLess(time.monotonic() - t0, 0.5)
+        self.assertGreater(core.rate_limiter("ip-api", batch=True).eta(1), 25)
+
+    def test_stop_interrupts_the_wait(self):
+        self.start(lambda method, path, body: (200, {"X-Rl": 0, "X-Ttl": 30}, ip_api_item(single_ip(path))))
+        core.fetch_ip_info("5.5.5.5")
+        stop = threading.Event()
+        threading.Timer(0.2, stop.set).start()
+        t0 = time.monotonic()
+        self.assertEqual(core.fetch_ip_info("5.5.5.6", stop=stop), core.TIMED_OUT)
+        self.assertLess(time.monotonic() - t0, 2)
+        self.assertEqual(len(self.stub.requests), 1)
+
+
+class RateLimiterEtaTests(unittest.TestCase):
+    def test_eta_counts_whole_windows_beyond_the_current_one(self):
+        limiter = core.RateLimiter(15, window=60)
+        limiter.acquire()
+        limiter.update({"X-Rl": "5", "X-Ttl": "10"}, 200)
+        self.assertEqual(limiter.eta(5), 0.0)
+        self.assertAlmostEqual(limiter.eta(6), 10, delta=0.5)
+        self.assertAlmostEqual(limiter.eta(21), 70, delta=0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()